@@ -1,9 +1,17 @@
 import streamlit as st
+import altair as alt
+import numpy as np
+import pandas as pd
 from datetime import date
 from financial_utils import (
     calculate_ytm_linear, generate_coupon_dates, find_last_coupon_before_purchase,
-    calculate_precise_accrued_interest, count_remaining_coupons
+    calculate_precise_accrued_interest, count_remaining_coupons,
+    get_months_increment_array, to_day_ordinals, month_index, generate_coupon_ordinals_matrix,
+    generate_coupon_ordinals_flat,
+    CouponSchedule, calculate_bond_present_value, solve_safeguarded_newton,
+    calculate_accrued_interest_vectorized, locate_coupons_in_matrix, broadcast_bond_columns
 )
+from day_count import DAY_COUNT_CONVENTIONS, DEFAULT_DAY_COUNT, year_fraction, year_fraction_vectorized
 from ui_components import format_currency, format_percentage
 
 def render_bond_section():
@@ -102,6 +110,14 @@ def render_professional_bond_section():
                 step=1,
                 key="prof_bond_number"
             )
+            
+            day_count = st.selectbox(
+                "Convenzione Calcolo Giorni",
+                list(DAY_COUNT_CONVENTIONS),
+                index=list(DAY_COUNT_CONVENTIONS).index(DEFAULT_DAY_COUNT),
+                key="prof_bond_day_count",
+                help="Convenzione usata per rateo e frazioni d'anno (BTP: ACT/ACT ICMA)"
+            )
         
         with col2:
             st.write("**📅 Date Fondamentali**")
@@ -140,7 +156,7 @@ def render_professional_bond_section():
             
             days_since_issue = (purchase_date - issue_date).days
             days_to_maturity = (maturity_date - purchase_date).days
-            years_to_maturity = days_to_maturity / 365.25
+            years_to_maturity = year_fraction(purchase_date, maturity_date, day_count)
             
             st.write(f"**Giorni da Emissione:** {days_since_issue}")
             st.write(f"**Giorni a Scadenza:** {days_to_maturity}")
@@ -153,11 +169,66 @@ def render_professional_bond_section():
             try:
                 results = calculate_professional_bond(
                     nominal_value, coupon_rate, purchase_price, coupon_frequency,
-                    num_bonds, issue_date, first_coupon_date, purchase_date, maturity_date
+                    num_bonds, issue_date, first_coupon_date, purchase_date, maturity_date, day_count
                 )
                 display_professional_bond_results(results)
+                
+                accrued_series = calculate_accrued_interest_series(
+                    nominal_value, coupon_rate, purchase_price, coupon_frequency,
+                    issue_date, first_coupon_date, purchase_date, maturity_date, day_count
+                )
+                display_accrued_interest_series(accrued_series)
             except Exception as e:
                 st.error(f"❌ Errore nel calcolo professionale: {str(e)}")
+        
+        st.write("**🗺️ Superficie di Sensitività Prezzo/Rendimento**")
+        surface_col1, surface_col2, surface_col3 = st.columns(3)
+        
+        with surface_col1:
+            surface_mode = st.radio(
+                "Tipo di Griglia",
+                ["Prezzo (Rendimento × Data)", "Rendimento (Prezzo × Data)"],
+                key="prof_bond_surface_mode"
+            )
+        
+        with surface_col2:
+            if surface_mode == "Prezzo (Rendimento × Data)":
+                axis_min = st.number_input("Rendimento Minimo (%)", value=0.0, step=0.1, key="prof_bond_surface_min_yield")
+                axis_max = st.number_input("Rendimento Massimo (%)", value=6.0, step=0.1, key="prof_bond_surface_max_yield")
+            else:
+                axis_min = st.number_input("Prezzo Clean Minimo (€)", min_value=0.01, value=nominal_value * 0.9,
+                                           step=0.1, key="prof_bond_surface_min_price")
+                axis_max = st.number_input("Prezzo Clean Massimo (€)", min_value=0.01, value=nominal_value * 1.1,
+                                           step=0.1, key="prof_bond_surface_max_price")
+        
+        with surface_col3:
+            grid_points = st.slider("Punti per Asse", min_value=5, max_value=200, value=40, key="prof_bond_surface_points")
+        
+        if st.button("🗺️ Calcola Superficie", key="calc_prof_bond_surface"):
+            try:
+                settlement_dates = np.unique(np.linspace(
+                    to_day_ordinals(purchase_date), to_day_ordinals(maturity_date) - 1, grid_points
+                ).round().astype(np.int64)).astype("datetime64[D]")
+                axis_values = np.linspace(axis_min, axis_max, grid_points)
+                
+                if surface_mode == "Prezzo (Rendimento × Data)":
+                    surface = calculate_price_surface(
+                        nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date,
+                        maturity_date, settlement_dates, axis_values / 100, day_count
+                    )
+                    display_bond_surface(surface, "Prezzo Clean (€)", "Rendimento (%)")
+                else:
+                    surface = calculate_yield_surface(
+                        nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date,
+                        maturity_date, settlement_dates, axis_values, day_count
+                    ) * 100
+                    unsolved_cells = int(surface.isna().to_numpy().sum())
+                    if unsolved_cells > 0:
+                        st.error(f"❌ Rendimento non calcolabile per {unsolved_cells} celle: prezzo fuori "
+                                 "dall'intervallo di rendimenti risolvibile")
+                    display_bond_surface(surface, "Rendimento (%)", "Prezzo Clean (€)")
+            except Exception as e:
+                st.error(f"❌ Errore nel calcolo della superficie: {str(e)}")
 
 def calculate_basic_bond(nominal_value, coupon_rate, purchase_price, years_to_maturity):
     """Calculate basic bond metrics"""
@@ -173,18 +244,12 @@ def calculate_basic_bond(nominal_value, coupon_rate, purchase_price, years_to_ma
     }
 
 def calculate_professional_bond(nominal_value, coupon_rate, purchase_price, coupon_frequency,
-                              num_bonds, issue_date, first_coupon_date, purchase_date, maturity_date):
+                              num_bonds, issue_date, first_coupon_date, purchase_date, maturity_date,
+                              day_count=DEFAULT_DAY_COUNT):
     """Calculate professional bond metrics with precise calculations"""
     
     # Validate dates
-    if issue_date >= purchase_date:
-        raise ValueError("La data di emissione deve essere precedente alla data di acquisto!")
-    
-    if first_coupon_date <= issue_date:
-        raise ValueError("La data primo pagamento interessi deve essere successiva alla data di emissione!")
-        
-    if maturity_date <= purchase_date:
-        raise ValueError("La data di scadenza deve essere successiva alla data di acquisto!")
+    validate_bond_dates(issue_date, first_coupon_date, purchase_date, maturity_date)
     
     # Generate all coupon dates
     coupon_dates = generate_coupon_dates(issue_date, maturity_date, first_coupon_date, coupon_frequency)
@@ -198,25 +263,14 @@ def calculate_professional_bond(nominal_value, coupon_rate, purchase_price, coup
     # Calculate precise accrued interest
     if last_coupon:
         accrued_interest = calculate_precise_accrued_interest(
-            nominal_value, coupon_rate, last_coupon, purchase_date, next_coupon
+            nominal_value, coupon_rate, last_coupon, purchase_date, next_coupon, day_count
         )
     else:
-        # If no coupon has been paid yet, calculate from issue date
+        # If no coupon has been paid yet, accrue over the first coupon period from issue date
         if purchase_date > issue_date:
-            days_since_issue = (purchase_date - issue_date).days
-            days_to_first_coupon = (first_coupon_date - issue_date).days
-            
-            annual_coupon = nominal_value * (coupon_rate / 100)
-            months_to_first_coupon = (first_coupon_date.year - issue_date.year) * 12 + (first_coupon_date.month - issue_date.month)
-            
-            if months_to_first_coupon <= 3:
-                first_coupon_amount = annual_coupon / 4
-            elif months_to_first_coupon <= 6:
-                first_coupon_amount = annual_coupon / 2
-            else:
-                first_coupon_amount = annual_coupon
-            
-            accrued_interest = first_coupon_amount * (days_since_issue / days_to_first_coupon)
+            accrued_interest = calculate_precise_accrued_interest(
+                nominal_value, coupon_rate, issue_date, purchase_date, first_coupon_date, day_count
+            )
         else:
             accrued_interest = 0
     
@@ -238,6 +292,18 @@ def calculate_professional_bond(nominal_value, coupon_rate, purchase_price, coup
     else:
         ytm = 0
     
+    # Compounded yield and risk measures from the discounted cash flows
+    periods_per_year = get_periods_per_year(coupon_frequency)
+    periods_to_next_coupon, periods_to_maturity = calculate_cash_flow_timing(
+        to_day_ordinals(purchase_date), to_day_ordinals(last_coupon if last_coupon else issue_date),
+        to_day_ordinals(next_coupon if next_coupon else maturity_date), to_day_ordinals(maturity_date),
+        next_coupon is not None, periods_per_year, day_count
+    )
+    risk_measures = calculate_yield_and_risk_measures(
+        dirty_price, coupon_per_period, nominal_value, remaining_coupons,
+        periods_to_next_coupon, periods_to_maturity, periods_per_year
+    )
+    
     return {
         'coupon_dates': coupon_dates,
         'last_coupon': last_coupon,
@@ -257,9 +323,375 @@ def calculate_professional_bond(nominal_value, coupon_rate, purchase_price, coup
         'first_coupon_date': first_coupon_date,
         'purchase_date': purchase_date,
         'maturity_date': maturity_date,
-        'days_to_maturity': days_to_maturity
+        'days_to_maturity': days_to_maturity,
+        'day_count': day_count,
+        **{key: value[0].item() for key, value in risk_measures.items()}
     }
 
+def calculate_professional_bond_batch(nominal_values, coupon_rates, purchase_prices, coupon_frequencies,
+                                      issue_dates, first_coupon_dates, purchase_dates, maturity_dates,
+                                      num_bonds=1, day_counts=DEFAULT_DAY_COUNT):
+    """Calculate professional bond metrics for a whole portfolio in one vectorized pass.
+
+    Every argument is a column (list, NumPy array or pandas Series) with one entry
+    per bond, or a scalar shared by all bonds; day_counts selects the day count convention
+    of each bond. Results match calculate_professional_bond bond by bond and are returned
+    as a dict of NumPy arrays.
+    """
+    nominal_values, coupon_rates, purchase_prices, num_bonds, months_increment, issue, first_coupon, \
+        purchase, maturity, day_counts = broadcast_bond_columns(
+            np.asarray(nominal_values, dtype=float),
+            np.asarray(coupon_rates, dtype=float),
+            np.asarray(purchase_prices, dtype=float),
+            np.asarray(num_bonds, dtype=float),
+            get_months_increment_array(coupon_frequencies),
+            to_day_ordinals(issue_dates),
+            to_day_ordinals(first_coupon_dates),
+            to_day_ordinals(purchase_dates),
+            to_day_ordinals(maturity_dates),
+            day_counts
+        )
+    
+    # Validate dates
+    _raise_for_invalid_rows(issue >= purchase, "La data di emissione deve essere precedente alla data di acquisto!")
+    _raise_for_invalid_rows(first_coupon <= issue, "La data primo pagamento interessi deve essere successiva alla data di emissione!")
+    _raise_for_invalid_rows(maturity <= purchase, "La data di scadenza deve essere successiva alla data di acquisto!")
+    
+    # Generate all coupon schedules as a padded matrix
+    coupon_ordinals, valid = generate_coupon_ordinals_matrix(first_coupon, maturity, months_increment)
+    total_coupons = valid.sum(axis=1)
+    _raise_for_invalid_rows(total_coupons == 0, "Impossibile generare le date delle cedole. Verifica i parametri.")
+    
+    # Find last and next coupon relative to purchase
+    remaining_coupons, last_coupon, next_coupon, has_last, has_next = locate_coupons_in_matrix(
+        coupon_ordinals, valid, purchase
+    )
+    
+    annual_coupon = nominal_values * (coupon_rates / 100)
+    accrued_interest = calculate_accrued_interest_vectorized(
+        annual_coupon, issue, first_coupon, purchase, last_coupon, next_coupon, has_last, has_next, day_counts
+    )
+    
+    # Calculate dirty price and other metrics
+    dirty_price = purchase_prices + accrued_interest
+    periods_per_year = 12 // months_increment
+    coupon_per_period = annual_coupon / periods_per_year
+    
+    # Calculate YTM and future cash flows
+    days_to_maturity = maturity - purchase
+    total_future_coupons = coupon_per_period * remaining_coupons * num_bonds
+    total_future_cash_flows = total_future_coupons + nominal_values * num_bonds
+    cash_flows_per_bond = total_future_cash_flows / num_bonds
+    safe_dirty_price = np.where(dirty_price > 0, dirty_price, 1.0)
+    ytm = np.where(dirty_price > 0,
+                   ((cash_flows_per_bond / safe_dirty_price) - 1) * (365 / days_to_maturity),
+                   0.0)
+    
+    # Compounded yield and risk measures from the same discounted cash flows
+    periods_to_next_coupon, periods_to_maturity = calculate_cash_flow_timing(
+        purchase, np.where(has_last, last_coupon, issue), next_coupon, maturity,
+        has_next, periods_per_year, day_counts
+    )
+    risk_measures = calculate_yield_and_risk_measures(
+        dirty_price, coupon_per_period, nominal_values, remaining_coupons,
+        periods_to_next_coupon, periods_to_maturity, periods_per_year
+    )
+    
+    not_a_date = np.datetime64("NaT", "D")
+    return {
+        'last_coupon': np.where(has_last, last_coupon.astype("datetime64[D]"), not_a_date),
+        'next_coupon': np.where(has_next, next_coupon.astype("datetime64[D]"), not_a_date),
+        'accrued_interest': accrued_interest,
+        'dirty_price': dirty_price,
+        'remaining_coupons': remaining_coupons,
+        'annual_coupon': annual_coupon,
+        'coupon_per_period': coupon_per_period,
+        'total_future_coupons': total_future_coupons,
+        'total_future_cash_flows': total_future_cash_flows,
+        'ytm': ytm,
+        'num_bonds': num_bonds,
+        'nominal_value': nominal_values,
+        'purchase_price': purchase_prices,
+        'days_to_maturity': days_to_maturity,
+        'non_converged_rows': np.flatnonzero(~risk_measures['ytm_converged']),
+        **risk_measures
+    }
+
+def calculate_cash_flow_timing(settlement_ordinals, period_start_ordinals, next_coupon_ordinals, maturity_ordinals,
+                               has_next, periods_per_year, day_count=DEFAULT_DAY_COUNT):
+    """Measure the time to the next coupon and to maturity in coupon periods.
+
+    The time to the next coupon is the fraction of the current coupon period still to run
+    and the time to maturity the year fraction times the coupons per year, both under the
+    bond's day count convention. Returns (periods_to_next_coupon, periods_to_maturity).
+    """
+    periods_to_maturity = year_fraction_vectorized(settlement_ordinals, maturity_ordinals, day_count) * periods_per_year
+    next_coupon = np.where(has_next, next_coupon_ordinals, np.asarray(period_start_ordinals) + 1)
+    period_length = year_fraction_vectorized(
+        period_start_ordinals, next_coupon, day_count, period_start_ordinals, next_coupon, periods_per_year
+    )
+    time_to_next_coupon = year_fraction_vectorized(
+        settlement_ordinals, next_coupon, day_count, period_start_ordinals, next_coupon, periods_per_year
+    )
+    periods_to_next_coupon = np.where(has_next & (period_length > 0),
+                                      time_to_next_coupon / np.where(period_length > 0, period_length, 1),
+                                      periods_to_maturity)
+    return periods_to_next_coupon, periods_to_maturity
+
+def calculate_yield_and_risk_measures(dirty_prices, coupon_per_period, nominal_values, remaining_coupons,
+                                      periods_to_next_coupon, periods_to_maturity, periods_per_year):
+    """Solve the compounded yield and derive duration, convexity and DV01 in the same pass.
+
+    Remaining coupons fall every period starting periods_to_next_coupon periods from now and
+    the principal is repaid with the last coupon (or after periods_to_maturity periods when no
+    coupon is left). The price derivatives evaluated at the solved yield give the risk
+    measures analytically, without bumping and repricing. Works on arrays of bonds.
+    Bonds whose price cannot be matched by a yield in the solver bracket are flagged False in
+    'ytm_converged' and get NaN yield and risk measures.
+    """
+    dirty_prices, coupon_per_period, nominal_values, remaining_coupons, periods_to_next_coupon, \
+        periods_to_maturity, periods_per_year = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(dirty_prices, dtype=float)),
+            np.asarray(coupon_per_period, dtype=float),
+            np.asarray(nominal_values, dtype=float),
+            np.asarray(remaining_coupons, dtype=float),
+            np.asarray(periods_to_next_coupon, dtype=float),
+            np.asarray(periods_to_maturity, dtype=float),
+            np.asarray(periods_per_year, dtype=float)
+        )
+    period_shift = 1 - periods_to_next_coupon
+    principal_periods = np.where(remaining_coupons > 0, remaining_coupons - period_shift, periods_to_maturity)
+    
+    def price_difference(period_yield):
+        present_value, derivative, _ = calculate_bond_present_value(
+            period_yield, coupon_per_period, nominal_values, remaining_coupons, principal_periods, period_shift
+        )
+        return present_value - dirty_prices, derivative
+    
+    period_ytm, converged = solve_safeguarded_newton(price_difference, lower=-0.99, upper=10.0,
+                                                     initial_guess=0.05 / periods_per_year)
+    present_value, first_derivative, second_derivative = calculate_bond_present_value(
+        np.where(converged, period_ytm, 0.0), coupon_per_period, nominal_values, remaining_coupons,
+        principal_periods, period_shift
+    )
+    
+    # Derivatives with respect to the annual yield (compounded periods_per_year times)
+    annual_first_derivative = first_derivative / periods_per_year
+    annual_second_derivative = second_derivative / periods_per_year ** 2
+    modified_duration = -annual_first_derivative / present_value
+    
+    def where_converged(values):
+        return np.where(converged, values, np.nan)
+    
+    return {
+        'ytm_compounded': where_converged(period_ytm * periods_per_year),
+        'macaulay_duration': where_converged(modified_duration * (1 + period_ytm)),
+        'modified_duration': where_converged(modified_duration),
+        'convexity': where_converged(annual_second_derivative / present_value),
+        'dv01': where_converged(-annual_first_derivative * 0.0001),
+        'ytm_converged': converged
+    }
+
+def validate_bond_dates(issue_date, first_coupon_date, purchase_date, maturity_date):
+    """Check the chronological order of the bond dates, raising ValueError when inconsistent"""
+    if issue_date >= purchase_date:
+        raise ValueError("La data di emissione deve essere precedente alla data di acquisto!")
+    
+    if first_coupon_date <= issue_date:
+        raise ValueError("La data primo pagamento interessi deve essere successiva alla data di emissione!")
+        
+    if maturity_date <= purchase_date:
+        raise ValueError("La data di scadenza deve essere successiva alla data di acquisto!")
+
+def calculate_accrued_interest_series(nominal_value, coupon_rate, purchase_price, coupon_frequency,
+                                      issue_date, first_coupon_date, purchase_date, maturity_date,
+                                      day_count=DEFAULT_DAY_COUNT):
+    """Calculate accrued interest and dirty price for every calendar day from purchase to maturity.
+
+    The whole curve comes from one binary search of the coupon schedule; the clean price
+    is held at the purchase price. Returns a DataFrame indexed by date.
+    """
+    # Validate dates
+    validate_bond_dates(issue_date, first_coupon_date, purchase_date, maturity_date)
+    
+    days = np.arange(to_day_ordinals(purchase_date), to_day_ordinals(maturity_date) + 1)
+    settlement = _evaluate_settlement_dates(
+        nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date, maturity_date, days, day_count
+    )
+    accrued_interest = settlement['accrued_interest']
+    
+    return pd.DataFrame({
+        'clean_price': np.full(days.size, float(purchase_price)),
+        'accrued_interest': accrued_interest,
+        'dirty_price': purchase_price + accrued_interest,
+        'remaining_coupons': settlement['remaining_coupons']
+    }, index=pd.DatetimeIndex(days.astype("datetime64[D]"), name='date'))
+
+def calculate_price_surface(nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date,
+                            maturity_date, settlement_dates, annual_yields, day_count=DEFAULT_DAY_COUNT):
+    """Calculate clean prices over a settlement date x compounded yield grid in one broadcast.
+
+    Returns a DataFrame with one row per settlement date and one column per yield (in %).
+    """
+    settlement_dates, days = _validate_surface_dates(issue_date, first_coupon_date, maturity_date, settlement_dates)
+    settlement = _evaluate_settlement_dates(
+        nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date, maturity_date, days, day_count
+    )
+    annual_yields = np.asarray(annual_yields, dtype=float)
+    
+    dirty_price, _, _ = calculate_bond_present_value(
+        annual_yields[None, :] / settlement['periods_per_year'],
+        settlement['coupon_per_period'], nominal_value,
+        settlement['remaining_coupons'][:, None], settlement['principal_periods'][:, None],
+        settlement['period_shift'][:, None]
+    )
+    clean_price = dirty_price - settlement['accrued_interest'][:, None]
+    
+    return pd.DataFrame(clean_price, index=pd.DatetimeIndex(settlement_dates, name='date'),
+                        columns=pd.Index(np.round(annual_yields * 100, 4), name='yield_perc'))
+
+def calculate_yield_surface(nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date,
+                            maturity_date, settlement_dates, clean_prices, day_count=DEFAULT_DAY_COUNT):
+    """Calculate compounded yields over a settlement date x clean price grid in one solve.
+
+    All grid cells are solved together by the vectorized safeguarded Newton. Returns a
+    DataFrame with one row per settlement date and one column per clean price.
+    """
+    settlement_dates, days = _validate_surface_dates(issue_date, first_coupon_date, maturity_date, settlement_dates)
+    settlement = _evaluate_settlement_dates(
+        nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date, maturity_date, days, day_count
+    )
+    clean_prices = np.asarray(clean_prices, dtype=float)
+    grid_shape = (days.size, clean_prices.size)
+    
+    def grid(values):
+        return np.broadcast_to(values[:, None], grid_shape).ravel()
+    
+    risk_measures = calculate_yield_and_risk_measures(
+        (clean_prices[None, :] + settlement['accrued_interest'][:, None]).ravel(),
+        settlement['coupon_per_period'], nominal_value, grid(settlement['remaining_coupons']),
+        grid(1 - settlement['period_shift']), grid(settlement['principal_periods']), settlement['periods_per_year']
+    )
+    
+    return pd.DataFrame(risk_measures['ytm_compounded'].reshape(grid_shape),
+                        index=pd.DatetimeIndex(settlement_dates, name='date'),
+                        columns=pd.Index(clean_prices, name='clean_price'))
+
+def _validate_surface_dates(issue_date, first_coupon_date, maturity_date, settlement_dates):
+    """Validate the settlement dates of a surface and return them with their day ordinals"""
+    settlement_dates = np.atleast_1d(np.asarray(settlement_dates, dtype="datetime64[D]"))
+    validate_bond_dates(issue_date, first_coupon_date, settlement_dates.min().item(), maturity_date)
+    if settlement_dates.max() >= np.datetime64(maturity_date, "D"):
+        raise ValueError("La data di scadenza deve essere successiva alla data di acquisto!")
+    return settlement_dates, settlement_dates.astype(np.int64)
+
+def _evaluate_settlement_dates(nominal_value, coupon_rate, coupon_frequency, issue_date, first_coupon_date,
+                               maturity_date, settlement_ordinals, day_count=DEFAULT_DAY_COUNT):
+    """Locate settlement dates in the coupon schedule and derive accrual and cash flow timing"""
+    schedule = CouponSchedule.from_bond(first_coupon_date, maturity_date, coupon_frequency)
+    if len(schedule) == 0:
+        raise ValueError("Impossibile generare le date delle cedole. Verifica i parametri.")
+    
+    paid_coupons, last_coupon, next_coupon, has_last, has_next = schedule.locate(
+        settlement_ordinals.astype("datetime64[D]")
+    )
+    remaining_coupons = len(schedule) - paid_coupons
+    issue = to_day_ordinals(issue_date)
+    
+    annual_coupon = nominal_value * (coupon_rate / 100)
+    accrued_interest = calculate_accrued_interest_vectorized(
+        annual_coupon, issue, to_day_ordinals(first_coupon_date), settlement_ordinals,
+        last_coupon, next_coupon, has_last, has_next, day_count
+    )
+    
+    # Cash flow timing in coupon periods, as in the professional yield and risk measures
+    periods_per_year = get_periods_per_year(coupon_frequency)
+    periods_to_next_coupon, periods_to_maturity = calculate_cash_flow_timing(
+        settlement_ordinals, np.where(has_last, last_coupon, issue), next_coupon, to_day_ordinals(maturity_date),
+        has_next, periods_per_year, day_count
+    )
+    period_shift = 1 - periods_to_next_coupon
+    
+    return {
+        'accrued_interest': accrued_interest,
+        'remaining_coupons': remaining_coupons,
+        'coupon_per_period': get_coupon_per_period(annual_coupon, coupon_frequency),
+        'periods_per_year': periods_per_year,
+        'period_shift': period_shift,
+        'principal_periods': np.where(has_next, remaining_coupons - period_shift, periods_to_maturity)
+    }
+
+def _raise_for_invalid_rows(invalid, message):
+    """Raise a ValueError listing the portfolio rows that fail a validation check"""
+    invalid_rows = np.flatnonzero(invalid)
+    if invalid_rows.size > 0:
+        shown_rows = ", ".join(str(row) for row in invalid_rows[:10])
+        if invalid_rows.size > 10:
+            shown_rows += ", ..."
+        raise ValueError(f"{message} (righe: {shown_rows})")
+
+def build_cash_flow_ladder(as_of_date, nominal_values, coupon_rates, coupon_frequencies,
+                           first_coupon_dates, maturity_dates, num_bonds=1, bucket="Mensile"):
+    """Aggregate the future coupon and redemption flows of a whole portfolio by month or day.
+
+    Only the scheduled coupons of each bond are expanded into flat (date ordinal, amount)
+    arrays, so a single long bond does not pad the short ones, and the flows are reduced
+    with bincount: the cost grows linearly with the number of flows. Returns a DataFrame
+    with coupons, redemptions, total and cumulative total for every bucket holding a flow.
+    """
+    valuation = to_day_ordinals(as_of_date)
+    nominal_values, coupon_rates, months_increment, first_coupon, maturity, holdings = broadcast_bond_columns(
+        np.asarray(nominal_values, dtype=float), np.asarray(coupon_rates, dtype=float),
+        get_months_increment_array(coupon_frequencies), to_day_ordinals(first_coupon_dates),
+        to_day_ordinals(maturity_dates), np.asarray(num_bonds, dtype=float)
+    )
+    
+    coupon_ordinals, bond_index = generate_coupon_ordinals_flat(
+        first_coupon.astype("datetime64[D]"), maturity.astype("datetime64[D]"), months_increment
+    )
+    future = coupon_ordinals > valuation
+    coupon_ordinals, bond_index = coupon_ordinals[future], bond_index[future]
+    coupon_amounts = (nominal_values * (coupon_rates / 100) / (12 // months_increment) * holdings)[bond_index]
+    redeemed = maturity > valuation
+    
+    flow_ordinals = np.concatenate([coupon_ordinals, maturity[redeemed]])
+    flow_amounts = np.concatenate([coupon_amounts, (nominal_values * holdings)[redeemed]])
+    flow_is_redemption = np.arange(flow_ordinals.size) >= coupon_ordinals.size
+    has_flow = flow_amounts != 0
+    flow_ordinals, flow_amounts, flow_is_redemption = (
+        flow_ordinals[has_flow], flow_amounts[has_flow], flow_is_redemption[has_flow]
+    )
+    
+    columns = ['coupons', 'redemptions', 'total', 'cumulative_total']
+    if flow_ordinals.size == 0:
+        return pd.DataFrame(columns=columns, dtype=float)
+    
+    if bucket == "Mensile":
+        bucket_keys = month_index(flow_ordinals)
+    else:  # Giornaliero
+        bucket_keys = flow_ordinals
+    first_key = bucket_keys.min()
+    bucket_positions = bucket_keys - first_key
+    bucket_count = int(bucket_positions.max()) + 1
+    
+    coupons = np.bincount(bucket_positions, weights=np.where(flow_is_redemption, 0.0, flow_amounts), minlength=bucket_count)
+    redemptions = np.bincount(bucket_positions, weights=np.where(flow_is_redemption, flow_amounts, 0.0), minlength=bucket_count)
+    occupied = np.bincount(bucket_positions, minlength=bucket_count) > 0
+    
+    keys = np.flatnonzero(occupied) + first_key
+    if bucket == "Mensile":
+        index = pd.PeriodIndex((keys - 1970 * 12).astype("datetime64[M]"), freq='M', name='month')
+    else:
+        index = pd.DatetimeIndex(keys.astype("datetime64[D]"), name='date')
+    total = coupons[occupied] + redemptions[occupied]
+    
+    return pd.DataFrame({
+        'coupons': coupons[occupied],
+        'redemptions': redemptions[occupied],
+        'total': total,
+        'cumulative_total': np.cumsum(total)
+    }, index=index)
+
 def get_periods_per_year(coupon_frequency):
     """Get number of coupon periods per year"""
     if coupon_frequency == "Semestrale":
@@ -328,6 +760,17 @@ def display_professional_bond_results(results):
         st.write(f"• **YTM (Yield to Maturity): {format_percentage(results['ytm'] * 100, 3)}**")
         st.write(f"• **Capitale Totale a Fine Investimento: {format_currency(total_capital_at_end)}**")
         st.write(f"• **Guadagno Totale a Fine Investimento: {format_currency(total_gain)}**")
+        
+        st.write("**⚖️ Misure di Rischio:**")
+        if results['ytm_converged']:
+            st.write(f"• YTM Composto (capitalizzazione cedolare): {format_percentage(results['ytm_compounded'] * 100, 3)}")
+            st.write(f"• Duration di Macaulay: {results['macaulay_duration']:.3f} anni")
+            st.write(f"• Duration Modificata: {results['modified_duration']:.3f}")
+            st.write(f"• Convessità: {results['convexity']:.3f}")
+            st.write(f"• DV01 (per obbligazione): €{results['dv01']:.4f}")
+        else:
+            st.error("❌ YTM composto non calcolabile: il prezzo dirty non corrisponde ad alcun rendimento "
+                     "nell'intervallo risolvibile. Duration, convessità e DV01 non sono disponibili.")
     
     # Price analysis
     st.write("**📊 Analisi Aggiuntiva:**")
@@ -354,11 +797,12 @@ def display_professional_bond_results(results):
     
     with analysis_col2:
         # Time analysis
-        years_to_maturity = results['days_to_maturity'] / 365.25
-        days_since_issue = (results['purchase_date'] - results['issue_date']).days
+        years_to_maturity = year_fraction(results['purchase_date'], results['maturity_date'], results['day_count'])
+        years_since_issue = year_fraction(results['issue_date'], results['purchase_date'], results['day_count'])
         
         st.write("**⏱️ Analisi Temporale:**")
-        st.write(f"• Anni dalla Emissione: {days_since_issue/365.25:.2f}")
+        st.write(f"• Convenzione Giorni: {results['day_count']}")
+        st.write(f"• Anni dalla Emissione: {years_since_issue:.2f}")
         st.write(f"• Anni rimanenti: {years_to_maturity:.3f}")
         
         # Risk indicators
@@ -392,3 +836,39 @@ def display_professional_bond_results(results):
                     else:
                         status = "⏳ Futura"
                     st.write(f"{len(results['coupon_dates'])-4+i}. {coupon_date.strftime('%d/%m/%Y')} - {status}")
+
+def display_accrued_interest_series(series):
+    """Display daily accrued interest and dirty price charts for the holding period"""
+    st.write("**📈 Andamento Giornaliero Rateo e Prezzo Dirty (per obbligazione):**")
+    chart_col1, chart_col2 = st.columns(2)
+    
+    with chart_col1:
+        st.write("**Rateo Interessi Maturato**")
+        st.line_chart(series[['accrued_interest']].rename(columns={'accrued_interest': 'Rateo (€)'}))
+    
+    with chart_col2:
+        st.write("**Prezzo Clean e Dirty**")
+        st.line_chart(series[['clean_price', 'dirty_price']].rename(
+            columns={'clean_price': 'Prezzo Clean (€)', 'dirty_price': 'Prezzo Dirty (€)'}
+        ))
+
+def display_bond_surface(surface, value_label, column_label):
+    """Display a sensitivity surface as a heatmap and as a table"""
+    heatmap_data = surface.reset_index().melt(id_vars='date', var_name='column', value_name='value')
+    heatmap_data['column'] = heatmap_data['column'].astype(float)
+    
+    heatmap = alt.Chart(heatmap_data).mark_rect().encode(
+        x=alt.X('column:O', title=column_label, axis=alt.Axis(format='.2f', labelOverlap=True)),
+        y=alt.Y('date:O', title="Data di Regolamento", timeUnit='yearmonthdate', axis=alt.Axis(labelOverlap=True)),
+        color=alt.Color('value:Q', title=value_label, scale=alt.Scale(scheme='viridis')),
+        tooltip=[
+            alt.Tooltip('date:T', title="Data", format='%d/%m/%Y'),
+            alt.Tooltip('column:Q', title=column_label, format='.3f'),
+            alt.Tooltip('value:Q', title=value_label, format='.3f')
+        ]
+    )
+    st.altair_chart(heatmap)
+    
+    table = surface.copy()
+    table.index = table.index.strftime('%d/%m/%Y')
+    st.dataframe(table.round(3))
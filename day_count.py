@@ -0,0 +1,136 @@
+import numpy as np
+from collections import namedtuple
+
+DayCountConvention = namedtuple('DayCountConvention', ['year_fraction', 'year_fraction_vectorized'])
+
+DEFAULT_DAY_COUNT = "ACT/ACT ICMA"
+
+def _act_act_icma(start_date, end_date, reference_start=None, reference_end=None, periods_per_year=1):
+    """ACT/ACT ICMA: actual days over actual days of the coupon period times coupons per year"""
+    if reference_start is None or reference_end is None:
+        # Without a coupon period fall back to the average year length
+        return (end_date - start_date).days / 365.25
+    return (end_date - start_date).days / (reference_end - reference_start).days / periods_per_year
+
+def _act_act_icma_vectorized(start_ordinals, end_ordinals, reference_start=None, reference_end=None,
+                             periods_per_year=1):
+    """Vectorized ACT/ACT ICMA on day ordinals"""
+    days = (end_ordinals - start_ordinals).astype(float)
+    if reference_start is None or reference_end is None:
+        return days / 365.25
+    return days / (reference_end - reference_start) / periods_per_year
+
+def _act_360(start_date, end_date, reference_start=None, reference_end=None, periods_per_year=1):
+    """ACT/360: actual days over 360"""
+    return (end_date - start_date).days / 360
+
+def _act_360_vectorized(start_ordinals, end_ordinals, reference_start=None, reference_end=None,
+                        periods_per_year=1):
+    """Vectorized ACT/360 on day ordinals"""
+    return (end_ordinals - start_ordinals) / 360
+
+def _act_365_fixed(start_date, end_date, reference_start=None, reference_end=None, periods_per_year=1):
+    """ACT/365F: actual days over 365"""
+    return (end_date - start_date).days / 365
+
+def _act_365_fixed_vectorized(start_ordinals, end_ordinals, reference_start=None, reference_end=None,
+                              periods_per_year=1):
+    """Vectorized ACT/365F on day ordinals"""
+    return (end_ordinals - start_ordinals) / 365
+
+def _thirty_360(start_year, start_month, start_day, end_year, end_month, end_day):
+    """30/360 year fraction once the day adjustments have been applied"""
+    return (360 * (end_year - start_year) + 30 * (end_month - start_month) + (end_day - start_day)) / 360
+
+def _split_ordinals(day_ordinals):
+    """Split day ordinals into year, month and day arrays"""
+    dates = np.asarray(day_ordinals, dtype=np.int64).astype("datetime64[D]")
+    months = dates.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970
+    month_numbers = months.astype(np.int64) % 12 + 1
+    days = (dates - months.astype("datetime64[D]")).astype(np.int64) + 1
+    return years, month_numbers, days
+
+def _thirty_360_eu(start_date, end_date, reference_start=None, reference_end=None, periods_per_year=1):
+    """30/360 EU (30E/360): day 31 becomes 30 on both dates"""
+    return _thirty_360(start_date.year, start_date.month, min(start_date.day, 30),
+                       end_date.year, end_date.month, min(end_date.day, 30))
+
+def _thirty_360_eu_vectorized(start_ordinals, end_ordinals, reference_start=None, reference_end=None,
+                              periods_per_year=1):
+    """Vectorized 30/360 EU on day ordinals"""
+    start_year, start_month, start_day = _split_ordinals(start_ordinals)
+    end_year, end_month, end_day = _split_ordinals(end_ordinals)
+    return _thirty_360(start_year, start_month, np.minimum(start_day, 30),
+                       end_year, end_month, np.minimum(end_day, 30))
+
+def _thirty_360_us(start_date, end_date, reference_start=None, reference_end=None, periods_per_year=1):
+    """30/360 US (bond basis): end day 31 becomes 30 only when the start day is 30 or 31"""
+    start_day = min(start_date.day, 30)
+    end_day = 30 if end_date.day == 31 and start_day == 30 else end_date.day
+    return _thirty_360(start_date.year, start_date.month, start_day, end_date.year, end_date.month, end_day)
+
+def _thirty_360_us_vectorized(start_ordinals, end_ordinals, reference_start=None, reference_end=None,
+                              periods_per_year=1):
+    """Vectorized 30/360 US on day ordinals"""
+    start_year, start_month, start_day = _split_ordinals(start_ordinals)
+    end_year, end_month, end_day = _split_ordinals(end_ordinals)
+    start_day = np.minimum(start_day, 30)
+    end_day = np.where((end_day == 31) & (start_day == 30), 30, end_day)
+    return _thirty_360(start_year, start_month, start_day, end_year, end_month, end_day)
+
+DAY_COUNT_CONVENTIONS = {
+    "ACT/ACT ICMA": DayCountConvention(_act_act_icma, _act_act_icma_vectorized),
+    "ACT/360": DayCountConvention(_act_360, _act_360_vectorized),
+    "ACT/365F": DayCountConvention(_act_365_fixed, _act_365_fixed_vectorized),
+    "30/360 EU": DayCountConvention(_thirty_360_eu, _thirty_360_eu_vectorized),
+    "30/360 US": DayCountConvention(_thirty_360_us, _thirty_360_us_vectorized)
+}
+
+def register_day_count(name, year_fraction, year_fraction_vectorized):
+    """Register a day count convention with its scalar and vectorized implementations"""
+    DAY_COUNT_CONVENTIONS[name] = DayCountConvention(year_fraction, year_fraction_vectorized)
+
+def get_day_count(name):
+    """Get a registered day count convention by name"""
+    if name not in DAY_COUNT_CONVENTIONS:
+        raise ValueError(f"Convenzione di calcolo giorni non supportata: {name}")
+    return DAY_COUNT_CONVENTIONS[name]
+
+def year_fraction(start_date, end_date, day_count=DEFAULT_DAY_COUNT, reference_start=None,
+                  reference_end=None, periods_per_year=1):
+    """Year fraction between two dates; ACT/ACT ICMA uses the reference coupon period"""
+    return get_day_count(day_count).year_fraction(
+        start_date, end_date, reference_start, reference_end, periods_per_year
+    )
+
+def year_fraction_vectorized(start_ordinals, end_ordinals, day_count=DEFAULT_DAY_COUNT, reference_start=None,
+                             reference_end=None, periods_per_year=1):
+    """Year fractions between arrays of day ordinals.
+
+    day_count may be a single convention name or an array with one name per element;
+    elements are then grouped by convention so each implementation runs once.
+    """
+    start_ordinals, end_ordinals = np.broadcast_arrays(
+        np.asarray(start_ordinals, dtype=np.int64), np.asarray(end_ordinals, dtype=np.int64)
+    )
+    conventions = np.asarray(day_count)
+    if conventions.ndim == 0:
+        return get_day_count(str(conventions)).year_fraction_vectorized(
+            start_ordinals, end_ordinals, reference_start, reference_end, periods_per_year
+        )
+
+    shape = start_ordinals.shape
+    conventions = np.broadcast_to(conventions, shape)
+
+    def select(values, mask):
+        return None if values is None else np.broadcast_to(values, shape)[mask]
+
+    fractions = np.empty(shape)
+    for name in np.unique(conventions):
+        mask = conventions == name
+        fractions[mask] = get_day_count(str(name)).year_fraction_vectorized(
+            start_ordinals[mask], end_ordinals[mask], select(reference_start, mask),
+            select(reference_end, mask), select(periods_per_year, mask)
+        )
+    return fractions
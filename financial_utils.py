@@ -1,5 +1,11 @@
 from datetime import datetime, date
-from dateutil.relativedelta import relativedelta
+from bisect import bisect_right
+from functools import lru_cache, partial
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import numpy as np
+from day_count import DEFAULT_DAY_COUNT, year_fraction, year_fraction_vectorized
 
 def calculate_ytm_linear(dirty_price, nominal_value, total_future_cash_flows, days_to_maturity):
     """Calculate YTM using linear approximation formula (market standard for short-term bonds)"""
@@ -10,100 +16,343 @@ def calculate_ytm_linear(dirty_price, nominal_value, total_future_cash_flows, da
         return 0
 
 def calculate_ytm(price, nominal_value, coupon_rate, periods_to_maturity, coupon_frequency):
-    """Calculate Yield to Maturity using iterative method"""
+    """Calculate Yield to Maturity using the safeguarded closed-form solver"""
+    annual_ytm = calculate_ytm_vectorized(price, nominal_value, coupon_rate, periods_to_maturity, coupon_frequency)
+    return float(annual_ytm[0])
+
+def calculate_ytm_vectorized(prices, nominal_values, coupon_rates, periods_to_maturity, coupon_frequencies):
+    """Calculate the annual Yield to Maturity of many bonds at once.
+
+    Coupons are paid at the end of each of the int(periods_to_maturity) periods and the
+    principal at periods_to_maturity. Every argument may be an array or a scalar; bonds
+    whose price cannot be matched by any yield get NaN.
+    """
+    prices, nominal_values, coupon_rates, periods_to_maturity = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(prices, dtype=float)),
+        np.asarray(nominal_values, dtype=float),
+        np.asarray(coupon_rates, dtype=float),
+        np.asarray(periods_to_maturity, dtype=float)
+    )
+    periods_per_year = np.broadcast_to(12 // get_months_increment_array(coupon_frequencies), prices.shape)
+    coupon_per_period = (nominal_values * coupon_rates / 100) / periods_per_year
+    coupon_periods = np.floor(periods_to_maturity)
     
-    # Convert annual coupon rate to periodic rate
-    if coupon_frequency == "Semestrale":
-        coupon_per_period = (nominal_value * coupon_rate / 100) / 2
-        periods_per_year = 2
-    elif coupon_frequency == "Trimestrale":
-        coupon_per_period = (nominal_value * coupon_rate / 100) / 4
-        periods_per_year = 4
-    else:  # Annuale
-        coupon_per_period = nominal_value * coupon_rate / 100
-        periods_per_year = 1
+    def price_difference(period_yield):
+        present_value, derivative, _ = calculate_bond_present_value(
+            period_yield, coupon_per_period, nominal_values, coupon_periods, periods_to_maturity
+        )
+        return present_value - prices, derivative
     
-    # Initial guess for YTM (5% annually)
-    ytm_guess = 0.05 / periods_per_year
+    period_ytm, converged = solve_safeguarded_newton(
+        price_difference, lower=-0.99, upper=10.0, initial_guess=0.05 / periods_per_year
+    )
+    return np.where(converged, period_ytm * periods_per_year, np.nan)
+
+def calculate_coupon_stream_moments(period_rates, coupon_periods):
+    """Return sum(v^k), sum(k v^k) and sum(k^2 v^k) for k = 1..n with v = 1 / (1 + rate).
+
+    Uses the geometric series closed forms; rates too close to zero for the closed forms
+    to be accurate fall back to explicit vectorized discounting.
+    """
+    rate, periods = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(period_rates, dtype=float)), np.asarray(coupon_periods, dtype=float)
+    )
+    shape = rate.shape
+    rate, periods = rate.ravel(), periods.ravel()
+    small_rate = np.abs(rate) < 1e-3
+    safe_rate = np.where(small_rate, 1.0, rate)
     
-    # Newton-Raphson iteration
-    for _ in range(100):  # Max 100 iterations
-        # Calculate bond price with current YTM guess
-        pv_coupons = 0
-        pv_derivative = 0
-        
-        for period in range(1, int(periods_to_maturity) + 1):
-            discount_factor = (1 + ytm_guess) ** period
-            pv_coupons += coupon_per_period / discount_factor
-            pv_derivative -= period * coupon_per_period / (discount_factor * (1 + ytm_guess))
-        
-        # Present value of principal
-        pv_principal = nominal_value / ((1 + ytm_guess) ** periods_to_maturity)
-        pv_derivative -= periods_to_maturity * nominal_value / ((1 + ytm_guess) ** (periods_to_maturity + 1))
-        
-        # Total theoretical price
-        theoretical_price = pv_coupons + pv_principal
-        
-        # Price difference
-        price_difference = theoretical_price - price
+    v = 1 / (1 + safe_rate)
+    v_n = v ** periods
+    one_minus_v = safe_rate / (1 + safe_rate)
+    n = periods
+    
+    moment0 = v * (1 - v_n) / one_minus_v
+    moment1 = v * (1 - (n + 1) * v_n + n * v_n * v) / one_minus_v ** 2
+    moment2 = v * (1 + v - (n + 1) ** 2 * v_n + (2 * n ** 2 + 2 * n - 1) * v_n * v
+                   - n ** 2 * v_n * v ** 2) / one_minus_v ** 3
+    
+    if small_rate.any():
+        rows = np.flatnonzero(small_rate)
+        k = np.arange(1, int(periods[rows].max(initial=0)) + 1, dtype=float)
+        discount = np.where(k <= periods[rows, None], (1 + rate[rows, None]) ** -k, 0.0)
+        moment0[rows] = discount.sum(axis=1)
+        moment1[rows] = (discount * k).sum(axis=1)
+        moment2[rows] = (discount * k ** 2).sum(axis=1)
+    
+    return moment0.reshape(shape), moment1.reshape(shape), moment2.reshape(shape)
+
+def calculate_bond_present_value(period_yields, coupon_per_period, nominal_values, coupon_periods,
+                                 principal_periods, period_shift=0.0):
+    """Price a coupon stream and its principal, returning (present value, dPV/dy, d2PV/dy2).
+
+    Coupons fall at times k - period_shift (k = 1..coupon_periods) and the principal at
+    principal_periods, all measured in coupon periods and discounted at the periodic yield.
+    """
+    period_yields = np.asarray(period_yields, dtype=float)
+    shift = np.asarray(period_shift, dtype=float)
+    principal_periods = np.asarray(principal_periods, dtype=float)
+    growth = 1 + period_yields
+    
+    moment0, moment1, moment2 = calculate_coupon_stream_moments(period_yields, coupon_periods)
+    shift_factor = growth ** shift
+    coupons_pv = coupon_per_period * shift_factor * moment0
+    coupons_time = coupon_per_period * shift_factor * (moment1 - shift * moment0)
+    coupons_convexity = coupon_per_period * shift_factor * (
+        moment2 + (1 - 2 * shift) * moment1 + (shift ** 2 - shift) * moment0
+    )
+    
+    principal_pv = nominal_values * growth ** -principal_periods
+    present_value = coupons_pv + principal_pv
+    first_derivative = -(coupons_time + principal_periods * principal_pv) / growth
+    second_derivative = (coupons_convexity + principal_periods * (principal_periods + 1) * principal_pv) / growth ** 2
+    
+    return present_value, first_derivative, second_derivative
+
+def solve_safeguarded_newton(func, lower, upper, initial_guess=None, tolerance=1e-10, max_iterations=100):
+    """Find roots of many monotone equations at once with a bracketed Newton/bisection hybrid.
+
+    func maps an array of candidates to (values, derivatives). Newton steps that leave the
+    current bracket, or that are not at least half the size of the step before last, fall
+    back to bisection, so every bracketed root converges and well-behaved ones converge
+    quadratically.
+    Returns (roots, converged); rows without a sign change in [lower, upper] are not converged.
+    """
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        lower_value, _ = func(np.asarray(lower, dtype=float))
+        lower, upper, lower_value = np.broadcast_arrays(
+            np.asarray(lower, dtype=float), np.asarray(upper, dtype=float), lower_value
+        )
+        lower, upper, lower_value = lower.copy(), upper.copy(), lower_value.copy()
+        upper_value, _ = func(upper)
+        bracketed = np.sign(lower_value) * np.sign(upper_value) <= 0
         
-        # Break if close enough
-        if abs(price_difference) < 0.01:
-            break
+        if initial_guess is None:
+            x = (lower + upper) / 2
+        else:
+            x = np.clip(np.broadcast_to(np.asarray(initial_guess, dtype=float), lower.shape), lower, upper)
+        converged = ~bracketed
+        step = np.abs(upper - lower)
+        previous_step = step
         
-        # Newton-Raphson update
-        ytm_guess = ytm_guess - (price_difference / pv_derivative)
+        for _ in range(max_iterations):
+            value, derivative = func(x)
+            converged |= np.abs(value) < tolerance
+            if converged.all():
+                break
+            
+            # Shrink the bracket around the root
+            same_sign_as_lower = np.sign(value) == np.sign(lower_value)
+            lower = np.where(same_sign_as_lower, x, lower)
+            lower_value = np.where(same_sign_as_lower, value, lower_value)
+            upper = np.where(same_sign_as_lower, upper, x)
+            converged |= np.abs(upper - lower) < tolerance * (1 + np.abs(x))
+            
+            # Newton step, replaced by bisection when it leaves the bracket or progress is slow
+            newton_step = value / derivative
+            newton_x = x - newton_step
+            inside = np.isfinite(newton_x) & (newton_x > np.minimum(lower, upper)) & (newton_x < np.maximum(lower, upper))
+            use_newton = inside & (np.abs(newton_step) <= np.abs(previous_step) / 2)
+            previous_step = step
+            step = np.where(use_newton, newton_step, x - (lower + upper) / 2)
+            x = np.where(converged, x, x - step)
     
-    # Convert to annual YTM
-    annual_ytm = ytm_guess * periods_per_year
-    return annual_ytm
+    converged &= bracketed
+    return np.where(bracketed, x, np.nan), converged
 
-def generate_coupon_dates(issue_date, maturity_date, first_coupon_date, coupon_frequency):
-    """Generate all coupon payment dates from issue to maturity"""
-    coupon_dates = []
-    
-    # Determine the increment based on frequency
+def get_months_increment(coupon_frequency):
+    """Get number of months between two coupon payments"""
     if coupon_frequency == "Semestrale":
-        months_increment = 6
+        return 6
     elif coupon_frequency == "Trimestrale":
-        months_increment = 3
+        return 3
     else:  # Annuale
-        months_increment = 12
+        return 12
+
+def get_months_increment_array(coupon_frequencies):
+    """Vectorized version of get_months_increment for an array of frequency labels"""
+    coupon_frequencies = np.asarray(coupon_frequencies)
+    return np.where(coupon_frequencies == "Semestrale", 6,
+                    np.where(coupon_frequencies == "Trimestrale", 3, 12)).astype(np.int64)
+
+def broadcast_bond_columns(*columns):
+    """Broadcast per-bond columns and scalars together to one common portfolio length.
+
+    Returns one 1-D array per column, so a scalar shared by all bonds can be mixed with
+    per-bond columns in any argument.
+    """
+    columns = [np.asarray(column) for column in columns]
+    shape = np.broadcast_shapes((1,), *(column.shape for column in columns))
+    return [np.broadcast_to(column, shape) for column in columns]
+
+def to_day_ordinals(dates):
+    """Convert dates (date objects, strings or datetime64 values) to integer day ordinals since 1970-01-01"""
+    return np.asarray(dates, dtype="datetime64[D]").astype(np.int64)
+
+def month_index(day_ordinals):
+    """Get the absolute month index (year * 12 + month - 1) of day ordinals"""
+    months = np.asarray(day_ordinals, dtype=np.int64).astype("datetime64[D]").astype("datetime64[M]")
+    return months.astype(np.int64) + 1970 * 12
+
+def add_months_to_ordinals(day_ordinals, months):
+    """Add numbers of months to day ordinals, clipping the day to the length of the target month"""
+    dates = np.asarray(day_ordinals, dtype=np.int64).astype("datetime64[D]")
+    start_month = dates.astype("datetime64[M]")
+    start_day = (dates - start_month.astype("datetime64[D]")).astype(np.int64) + 1
+    target_months = start_month + np.asarray(months, dtype=np.int64)
+    month_start = target_months.astype("datetime64[D]")
+    month_length = ((target_months + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    return month_start.astype(np.int64) + np.minimum(month_length, start_day) - 1
+
+def generate_coupon_ordinals_matrix(first_coupon_dates, maturity_dates, months_increment):
+    """Generate the coupon schedules of many bonds as a padded matrix of day ordinals.
+
+    Row i holds the coupon dates of bond i, obtained by repeatedly adding
+    months_increment[i] months to its first coupon date (the day of month is
+    clipped to the month length exactly like chained relativedelta additions).
+    Returns (ordinals, valid): valid marks the dates that fall on or before maturity.
+    """
+    first = np.atleast_1d(np.asarray(first_coupon_dates, dtype="datetime64[D]"))
+    maturity = np.atleast_1d(np.asarray(maturity_dates, dtype="datetime64[D]"))
+    first, maturity, step = np.broadcast_arrays(first, maturity, np.asarray(months_increment, dtype=np.int64))
+    
+    first_month = first.astype("datetime64[M]")
+    first_day = (first - first_month.astype("datetime64[D]")).astype(np.int64) + 1
+    total_months = (maturity.astype("datetime64[M]") - first_month).astype(np.int64)
+    max_periods = int(np.maximum(total_months // step, 0).max(initial=0)) + 1
     
-    # Start from first coupon date
-    current_date = first_coupon_date
+    months = first_month[:, None] + np.arange(max_periods) * step[:, None]
+    month_start = months.astype("datetime64[D]")
+    month_length = ((months + 1).astype("datetime64[D]") - month_start).astype(np.int64)
     
-    # Generate all coupon dates until maturity
-    while current_date <= maturity_date:
-        coupon_dates.append(current_date)
-        current_date = current_date + relativedelta(months=months_increment)
+    # Chained month additions never move the day forward again once it has been clipped
+    day = np.minimum.accumulate(np.minimum(month_length, first_day[:, None]), axis=1)
+    ordinals = month_start.astype(np.int64) + day - 1
+    valid = ordinals <= maturity.astype(np.int64)[:, None]
     
-    return coupon_dates
+    return ordinals, valid
+
+def generate_coupon_ordinals_flat(first_coupon_dates, maturity_dates, months_increment):
+    """Generate the coupon schedules of many bonds as flat arrays of day ordinals.
+
+    Same dates as generate_coupon_ordinals_matrix, but only the coupons falling on or before
+    maturity are materialised instead of padding every bond to the longest schedule.
+    Returns (ordinals, bond_index), grouped by bond in schedule order.
+    """
+    first = np.atleast_1d(np.asarray(first_coupon_dates, dtype="datetime64[D]"))
+    maturity = np.atleast_1d(np.asarray(maturity_dates, dtype="datetime64[D]"))
+    first, maturity, step = np.broadcast_arrays(first, maturity, np.asarray(months_increment, dtype=np.int64))
+    
+    first_month = first.astype("datetime64[M]")
+    first_day = (first - first_month.astype("datetime64[D]")).astype(np.int64) + 1
+    total_months = (maturity.astype("datetime64[M]") - first_month).astype(np.int64)
+    counts = np.maximum(total_months // step, 0) + 1
+    
+    bond_index = np.repeat(np.arange(first.size), counts)
+    period = np.arange(bond_index.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    months = first_month[bond_index] + period * step[bond_index]
+    month_start = months.astype("datetime64[D]")
+    month_length = ((months + 1).astype("datetime64[D]") - month_start).astype(np.int64)
+    
+    # Chained month additions never move the day forward again once it has been clipped;
+    # shifting each bond below all previous ones restarts the running minimum at every bond
+    shift = bond_index * 32
+    day = np.minimum.accumulate(np.minimum(month_length, first_day[bond_index]) - shift) + shift
+    ordinals = month_start.astype(np.int64) + day - 1
+    valid = ordinals <= maturity.astype(np.int64)[bond_index]
+    
+    return ordinals[valid], bond_index[valid]
+
+COUPON_SCHEDULE_CACHE_SIZE = 512
+
+@lru_cache(maxsize=COUPON_SCHEDULE_CACHE_SIZE)
+def get_coupon_schedule_ordinals(first_coupon_date, maturity_date, months_increment):
+    """Get the coupon dates of one bond as a read-only array of day ordinals (LRU cached)"""
+    ordinals, valid = generate_coupon_ordinals_matrix(first_coupon_date, maturity_date, months_increment)
+    schedule = ordinals[0, valid[0]]
+    schedule.flags.writeable = False
+    return schedule
+
+def generate_coupon_dates(issue_date, maturity_date, first_coupon_date, coupon_frequency):
+    """Generate all coupon payment dates from issue to maturity"""
+    # Schedules depend only on first coupon, maturity and frequency, so reruns hit the cache
+    months_increment = get_months_increment(coupon_frequency)
+    schedule = get_coupon_schedule_ordinals(first_coupon_date, maturity_date, months_increment)
+    return schedule.astype("datetime64[D]").tolist()
 
 def find_last_coupon_before_purchase(coupon_dates, purchase_date):
     """Find the last coupon payment date before purchase date"""
-    last_coupon = None
-    next_coupon = None
-    
-    for coupon_date in coupon_dates:
-        if coupon_date <= purchase_date:
-            last_coupon = coupon_date
-        elif coupon_date > purchase_date and next_coupon is None:
-            next_coupon = coupon_date
-            break
+    # Coupon dates are sorted, so a binary search finds the split point
+    paid_coupons = bisect_right(coupon_dates, purchase_date)
+    last_coupon = coupon_dates[paid_coupons - 1] if paid_coupons > 0 else None
+    next_coupon = coupon_dates[paid_coupons] if paid_coupons < len(coupon_dates) else None
     
     return last_coupon, next_coupon
 
-def calculate_precise_accrued_interest(nominal_value, coupon_rate, last_coupon_date, purchase_date, next_coupon_date):
-    """Calculate accrued interest based on actual coupon period"""
-    if last_coupon_date is None or next_coupon_date is None:
-        return 0
+class CouponSchedule:
+    """Sorted coupon schedule answering last/next/remaining coupon queries by binary search.
+
+    Queries accept a single date or an array of settlement dates and return NumPy values;
+    missing last/next coupons are reported as NaT.
+    """
+    
+    def __init__(self, coupon_ordinals):
+        self.ordinals = np.sort(np.asarray(coupon_ordinals, dtype=np.int64))
+    
+    @classmethod
+    def from_dates(cls, coupon_dates):
+        """Build a schedule from a list of coupon dates"""
+        return cls(to_day_ordinals(coupon_dates))
+    
+    @classmethod
+    def from_bond(cls, first_coupon_date, maturity_date, coupon_frequency):
+        """Build the schedule of a bond from the cached coupon ordinals"""
+        months_increment = get_months_increment(coupon_frequency)
+        return cls(get_coupon_schedule_ordinals(first_coupon_date, maturity_date, months_increment))
     
-    # Days from last coupon to purchase
-    days_since_last_coupon = (purchase_date - last_coupon_date).days
+    def __len__(self):
+        return self.ordinals.size
     
-    # Total days in the coupon period
-    days_in_coupon_period = (next_coupon_date - last_coupon_date).days
+    def dates(self):
+        """Get the coupon dates as a list of date objects"""
+        return self.ordinals.astype("datetime64[D]").tolist()
+    
+    def paid_coupons(self, settlement_dates):
+        """Count coupons paid on or before each settlement date"""
+        return np.searchsorted(self.ordinals, to_day_ordinals(settlement_dates), side="right")
+    
+    def remaining_coupons(self, settlement_dates):
+        """Count coupons paid after each settlement date"""
+        return len(self) - self.paid_coupons(settlement_dates)
+    
+    def locate(self, settlement_dates):
+        """Locate each settlement date between its last and next coupon.
+
+        Returns (paid_coupons, last_ordinals, next_ordinals, has_last, has_next) as arrays;
+        where a coupon is missing its ordinal is the nearest schedule entry, so the result
+        can feed vectorized formulas masked by has_last/has_next.
+        """
+        paid = self.paid_coupons(settlement_dates)
+        lookup = self.ordinals if len(self) > 0 else np.zeros(1, dtype=np.int64)
+        last_index = np.clip(paid - 1, 0, lookup.size - 1)
+        next_index = np.clip(paid, 0, lookup.size - 1)
+        return paid, lookup[last_index], lookup[next_index], paid > 0, paid < len(self)
+    
+    def last_coupon(self, settlement_dates):
+        """Get the last coupon date on or before each settlement date"""
+        _, last_ordinals, _, has_last, _ = self.locate(settlement_dates)
+        return np.where(has_last, last_ordinals.astype("datetime64[D]"), np.datetime64("NaT", "D"))
+    
+    def next_coupon(self, settlement_dates):
+        """Get the first coupon date after each settlement date"""
+        _, _, next_ordinals, _, has_next = self.locate(settlement_dates)
+        return np.where(has_next, next_ordinals.astype("datetime64[D]"), np.datetime64("NaT", "D"))
+
+def calculate_precise_accrued_interest(nominal_value, coupon_rate, last_coupon_date, purchase_date, next_coupon_date,
+                                       day_count=DEFAULT_DAY_COUNT):
+    """Calculate accrued interest based on actual coupon period and the chosen day count convention"""
+    if last_coupon_date is None or next_coupon_date is None:
+        return 0
     
     # Annual coupon amount
     annual_coupon = nominal_value * (coupon_rate / 100)
@@ -112,20 +361,64 @@ def calculate_precise_accrued_interest(nominal_value, coupon_rate, last_coupon_d
     months_between = (next_coupon_date.year - last_coupon_date.year) * 12 + (next_coupon_date.month - last_coupon_date.month)
     
     if months_between <= 3:
-        coupon_per_period = annual_coupon / 4
+        periods_per_year = 4
     elif months_between <= 6:
-        coupon_per_period = annual_coupon / 2
+        periods_per_year = 2
     else:
-        coupon_per_period = annual_coupon
+        periods_per_year = 1
+    coupon_per_period = annual_coupon / periods_per_year
     
-    # Calculate accrued interest using actual/actual day count
-    accrued_interest = coupon_per_period * (days_since_last_coupon / days_in_coupon_period)
+    # Fraction of the coupon period accrued (days since last coupon / days in period for ACT/ACT)
+    accrued_fraction = year_fraction(
+        last_coupon_date, purchase_date, day_count, last_coupon_date, next_coupon_date, periods_per_year
+    ) * periods_per_year
+    accrued_interest = coupon_per_period * accrued_fraction
     
     return accrued_interest
 
+def calculate_accrued_interest_vectorized(annual_coupon, issue, first_coupon, settlement,
+                                          last_coupon, next_coupon, has_last, has_next,
+                                          day_count=DEFAULT_DAY_COUNT):
+    """Vectorized accrued interest on day ordinals, following the professional bond rules.
+
+    Accrues from the last coupon (or from issue before the first coupon) using the period
+    coupon implied by the length of the accrual period; nothing accrues after the last coupon.
+    day_count may be one convention name or one name per element.
+    """
+    # Accrual period: last/next coupon, or issue/first coupon when no coupon has been paid yet
+    period_start = np.where(has_last, last_coupon, issue)
+    period_end = np.where(has_last, next_coupon, first_coupon)
+    months_in_period = month_index(period_end) - month_index(period_start)
+    
+    periods_per_year = np.where(months_in_period <= 3, 4, np.where(months_in_period <= 6, 2, 1))
+    period_coupon = annual_coupon / periods_per_year
+    
+    no_accrual = (has_last & ~has_next) | (~has_last & (settlement <= issue))
+    period_end = np.where(no_accrual, period_start + 1, period_end)
+    accrued_fraction = year_fraction_vectorized(
+        period_start, settlement, day_count, period_start, period_end, periods_per_year
+    ) * periods_per_year
+    return np.where(no_accrual, 0.0, period_coupon * accrued_fraction)
+
+def locate_coupons_in_matrix(coupon_ordinals, valid, settlement_ordinals):
+    """Locate each settlement date in a padded coupon matrix.
+
+    Returns (remaining_coupons, last_coupon, next_coupon, has_last, has_next); the last and
+    next coupon ordinals are only meaningful where has_last/has_next are True.
+    """
+    settlement_ordinals = np.asarray(settlement_ordinals, dtype=np.int64)
+    paid_coupons = (valid & (coupon_ordinals <= settlement_ordinals[:, None])).sum(axis=1)
+    remaining_coupons = valid.sum(axis=1) - paid_coupons
+    last_index = np.maximum(paid_coupons - 1, 0)
+    next_index = np.minimum(paid_coupons, coupon_ordinals.shape[1] - 1)
+    last_coupon = np.take_along_axis(coupon_ordinals, last_index[:, None], axis=1)[:, 0]
+    next_coupon = np.take_along_axis(coupon_ordinals, next_index[:, None], axis=1)[:, 0]
+    
+    return remaining_coupons, last_coupon, next_coupon, paid_coupons > 0, remaining_coupons > 0
+
 def count_remaining_coupons(coupon_dates, purchase_date):
     """Count remaining coupon payments after purchase date"""
-    return len([date for date in coupon_dates if date > purchase_date])
+    return len(coupon_dates) - bisect_right(coupon_dates, purchase_date)
 
 def calculate_loan_payment(principal, annual_rate, years):
     """Calculate monthly loan payment using amortization formula"""
@@ -139,6 +432,58 @@ def calculate_loan_payment(principal, annual_rate, years):
     
     return monthly_payment
 
+def calculate_loan_payment_vectorized(principals, annual_rates, years):
+    """Vectorized version of calculate_loan_payment for arrays of loans"""
+    principals, annual_rates, years = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principals, dtype=float)),
+        np.asarray(annual_rates, dtype=float),
+        np.asarray(years, dtype=float)
+    )
+    monthly_rates = (annual_rates / 100) / 12
+    total_payments = years * 12
+    final_growth = np.exp(np.log1p(monthly_rates) * total_payments)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(
+            monthly_rates != 0,
+            principals * monthly_rates * final_growth / (final_growth - 1),
+            principals / total_payments
+        )
+
+def calculate_taeg_vectorized(loan_amounts, tan_annuals, loan_duration_years, upfront_fees=0,
+                              monthly_fees=0, monthly_insurance=0):
+    """Calculate the TAEG (annual percentage rate) of many loans at once.
+
+    The TAEG is the annual effective rate i at which the net amount received (loan minus
+    upfront fees) equals the present value of the monthly outflows (installment, fees and
+    insurance) discounted at (1 + i)^(k/12). Loans with no solution get NaN.
+    """
+    loan_amounts, tan_annuals, loan_duration_years, upfront_fees, monthly_fees, monthly_insurance = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(loan_amounts, dtype=float)),
+        np.asarray(tan_annuals, dtype=float),
+        np.asarray(loan_duration_years, dtype=float),
+        np.asarray(upfront_fees, dtype=float),
+        np.asarray(monthly_fees, dtype=float),
+        np.asarray(monthly_insurance, dtype=float)
+    )
+    total_payments = loan_duration_years * 12
+    monthly_outflows = (calculate_loan_payment_vectorized(loan_amounts, tan_annuals, loan_duration_years)
+                        + monthly_fees + monthly_insurance)
+    net_amounts = loan_amounts - upfront_fees
+    
+    # Work relative to the net amount so the solver tolerance does not depend on the loan size
+    outflow_ratios = monthly_outflows / net_amounts
+    
+    def present_value_difference(monthly_rate):
+        annuity, weighted_annuity, _ = calculate_coupon_stream_moments(monthly_rate, total_payments)
+        derivative = -outflow_ratios * weighted_annuity / (1 + monthly_rate)
+        return outflow_ratios * annuity - 1, derivative
+    
+    monthly_rate, converged = solve_safeguarded_newton(
+        present_value_difference, lower=-0.5, upper=1.0, initial_guess=(tan_annuals / 100) / 12
+    )
+    return np.where(converged, ((1 + monthly_rate) ** 12 - 1) * 100, np.nan)
+
 def calculate_compound_interest(initial_investment, interest_rate_annual, investment_years, recurring_investment=0):
     """Calculate future value with compound interest and optional recurring investments"""
     interest_rate_decimal = interest_rate_annual / 100
@@ -170,6 +515,357 @@ def calculate_compound_interest(initial_investment, interest_rate_annual, invest
         'total_gains': total_future_value - total_invested
     }
 
+def expand_yearly_values(values, num_plans, num_years):
+    """Turn per-plan values or (plans x years) paths into a (plans x num_years) matrix.
+
+    Paths shorter than num_years keep their last value, longer paths are truncated.
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim < 2:
+        return np.broadcast_to(np.atleast_1d(values)[:, None], (num_plans, max(num_years, 1)))
+    columns = np.minimum(np.arange(max(num_years, 1)), values.shape[1] - 1)
+    return np.broadcast_to(values[:, columns], (num_plans, max(num_years, 1)))
+
+def calculate_compound_interest_trajectory(initial_investments, interest_rates_annual, investment_years,
+                                           recurring_investments=0, inflation_rates=0, frequency="Annuale"):
+    """Nominal and real balance paths of many compound interest plans in one pass.
+
+    Rates and inflation (in %) are per-plan values or (plans x years) per-year paths, e.g.
+    inflation projections. Each row of the result is a plan and each column a period (year,
+    or month when frequency is "Mensile"), starting from period 0. Growth and deflators are
+    cumulative products of the per-period factors, and the same growth terms serve both the
+    nominal and the real balance. Contributions are paid at the end of each period as in
+    calculate_compound_interest / calculate_compound_interest_monthly. Periods after a plan's
+    horizon are NaN. Returns a dict of (plans x periods) arrays.
+    """
+    num_plans = max(np.shape(values)[0] if np.ndim(values) else 1 for values in (
+        initial_investments, interest_rates_annual, investment_years, recurring_investments, inflation_rates
+    ))
+    initial_investments, investment_years, recurring_investments = (
+        np.broadcast_to(np.asarray(values, dtype=float), num_plans)
+        for values in (initial_investments, investment_years, recurring_investments)
+    )
+    periods_per_year = 12 if frequency == "Mensile" else 1
+    total_periods = np.round(investment_years * periods_per_year).astype(np.int64)
+    num_periods = int(total_periods.max(initial=0))
+    num_years = -(-num_periods // periods_per_year)
+    
+    # Per-period growth and inflation factors, each year's value repeated over its periods
+    yearly_rates = expand_yearly_values(interest_rates_annual, num_plans, num_years)
+    yearly_inflation = expand_yearly_values(inflation_rates, num_plans, num_years)
+    period_growth = np.repeat(1 + yearly_rates / 100 / periods_per_year, periods_per_year, axis=1)[:, :num_periods]
+    period_inflation = np.repeat((1 + yearly_inflation / 100) ** (1 / periods_per_year), periods_per_year,
+                                 axis=1)[:, :num_periods]
+    
+    ones = np.ones((num_plans, 1))
+    growth = np.hstack([ones, np.cumprod(period_growth, axis=1)])
+    deflator = np.hstack([ones, np.cumprod(period_inflation, axis=1)])
+    periods = np.arange(num_periods + 1)
+    contribution_per_period = (recurring_investments / periods_per_year)[:, None]
+    
+    # W_k = G_k * (W_0 + c * sum_{j<=k} 1/G_j)
+    discounted_contributions = np.cumsum(np.hstack([np.zeros((num_plans, 1)), 1 / growth[:, 1:]]), axis=1)
+    balance = growth * (initial_investments[:, None] + contribution_per_period * discounted_contributions)
+    contributions = initial_investments[:, None] + contribution_per_period * periods
+    
+    in_horizon = periods <= total_periods[:, None]
+    return {
+        'years': periods / periods_per_year,
+        'balance': np.where(in_horizon, balance, np.nan),
+        'contributions': np.where(in_horizon, contributions, np.nan),
+        'interest': np.where(in_horizon, balance - contributions, np.nan),
+        'real_balance': np.where(in_horizon, balance / deflator, np.nan),
+        'growth': np.where(in_horizon, growth, np.nan),
+        'deflator': np.where(in_horizon, deflator, np.nan)
+    }
+
+def calculate_rolling_cagr(day_ordinals, prices, window_years=(1, 3, 5, 10)):
+    """CAGR over every rolling window of a price series, for several window lengths at once.
+
+    For each start date and window of N years the end is the first price on or after the
+    start plus N calendar years; the CAGR comes from the log-price difference over the
+    actual span (days / 365.25). Windows running past the end of the series are NaN.
+    Returns a dict with the start dates and a (starts x windows) array of CAGRs.
+    """
+    day_ordinals = np.asarray(day_ordinals, dtype=np.int64)
+    log_prices = np.log(np.asarray(prices, dtype=float))
+    window_years = np.atleast_1d(np.asarray(window_years, dtype=np.int64))
+    
+    targets = add_months_to_ordinals(day_ordinals[:, None], window_years * 12)
+    end_positions = np.searchsorted(day_ordinals, targets)
+    complete = end_positions < day_ordinals.size
+    end_positions = np.minimum(end_positions, day_ordinals.size - 1)
+    
+    years = (day_ordinals[end_positions] - day_ordinals[:, None]) / 365.25
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cagr = np.expm1((log_prices[end_positions] - log_prices[:, None]) / years)
+    
+    return {
+        'start_dates': day_ordinals.astype("datetime64[D]"),
+        'window_years': window_years,
+        'cagr': np.where(complete, cagr, np.nan)
+    }
+
+def calculate_xirr_vectorized(flow_day_ordinals, flow_amounts, account_offsets):
+    """Annual XIRR (in %) of many accounts with irregular dated cash flows, solved together.
+
+    Flows of all accounts are concatenated; account i owns flows account_offsets[i] to
+    account_offsets[i + 1] (CSR-style offsets, len = accounts + 1). Deposits are negative
+    and withdrawals or the final value positive; times are measured in days / 365 from each
+    account's first flow. Returns a dict with the XIRR, a converged mask and the indices of
+    the accounts that did not converge (no sign change of the NPV in (-99%, 1000%)).
+    """
+    flow_day_ordinals = np.asarray(flow_day_ordinals, dtype=np.int64)
+    flow_amounts = np.asarray(flow_amounts, dtype=float)
+    account_offsets = np.asarray(account_offsets, dtype=np.int64)
+    num_accounts = account_offsets.size - 1
+    flow_counts = np.diff(account_offsets)
+    account_ids = np.repeat(np.arange(num_accounts), flow_counts)
+    
+    first_day = np.full(num_accounts, np.iinfo(np.int64).max)
+    np.minimum.at(first_day, account_ids, flow_day_ordinals)
+    years = (flow_day_ordinals - first_day[account_ids]) / 365
+    scale = np.bincount(account_ids, weights=np.abs(flow_amounts), minlength=num_accounts)
+    scale = np.where(scale > 0, scale, 1.0)
+    
+    # NPV and its derivative per account, relative to the account's gross flows
+    def net_present_value(rate):
+        discount = (1 + rate[account_ids]) ** -years
+        value = np.bincount(account_ids, weights=flow_amounts * discount, minlength=num_accounts)
+        derivative = np.bincount(account_ids, weights=-years * flow_amounts * discount / (1 + rate[account_ids]),
+                                 minlength=num_accounts)
+        return value / scale, derivative / scale
+    
+    rate, converged = solve_safeguarded_newton(
+        net_present_value, lower=np.full(num_accounts, -0.99), upper=10.0, initial_guess=0.05
+    )
+    converged &= flow_counts > 0
+    
+    return {
+        'xirr': np.where(converged, rate * 100, np.nan),
+        'converged': converged,
+        'non_converged_accounts': np.flatnonzero(~converged)
+    }
+
+def solve_compound_interest_goal(solve_for, target_values, initial_investments=0, interest_rates_annual=0,
+                                 investment_years=0, recurring_investments=0, frequency="Annuale"):
+    """Invert the compound interest formula for many goals at once.
+
+    solve_for is "Tasso Annuo" (annual rate in %), "Versamento Annuo" (yearly recurring
+    investment) or "Durata (Anni)"; the other parameters are given, and every argument may be
+    an array. Contribution and horizon use closed forms, as does the rate without recurring
+    investments; otherwise the rate is found with the bracketed Newton solver. Contributions
+    are paid at the end of each period as in calculate_compound_interest(_monthly). Goals
+    that cannot be reached get NaN; goals already reached need a contribution of 0.
+    """
+    target_values, initial_investments, interest_rates_annual, investment_years, recurring_investments = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(target_values, dtype=float)),
+        np.asarray(initial_investments, dtype=float),
+        np.asarray(interest_rates_annual, dtype=float),
+        np.asarray(investment_years, dtype=float),
+        np.asarray(recurring_investments, dtype=float)
+    )
+    periods_per_year = 12 if frequency == "Mensile" else 1
+    period_rates = interest_rates_annual / 100 / periods_per_year
+    contributions = recurring_investments / periods_per_year
+    periods = investment_years * periods_per_year
+    
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        if solve_for == "Versamento Annuo":
+            growth = np.exp(np.log1p(period_rates) * periods)
+            annuity_factor = np.where(period_rates != 0, (growth - 1) / period_rates, periods)
+            required = (target_values - initial_investments * growth) / annuity_factor
+            return np.where(np.isfinite(required), np.maximum(required, 0) * periods_per_year, np.nan)
+        
+        if solve_for == "Durata (Anni)":
+            # g^n (P + c/r) = FV + c/r, or P + c n = FV when the rate is zero
+            perpetuity = contributions / np.where(period_rates != 0, period_rates, np.nan)
+            required = np.where(
+                period_rates != 0,
+                np.log((target_values + perpetuity) / (initial_investments + perpetuity)) / np.log1p(period_rates),
+                (target_values - initial_investments) / contributions
+            )
+            required = np.where(target_values <= initial_investments, 0.0, required)
+            return np.where(np.isfinite(required) & (required >= 0), required / periods_per_year, np.nan)
+        
+        if solve_for != "Tasso Annuo":
+            raise ValueError(f"Grandezza da calcolare non supportata: {solve_for}")
+        
+        periods = np.round(periods)
+        closed_form = np.where(contributions == 0,
+                               (target_values / initial_investments) ** (1 / periods) - 1, np.nan)
+        
+        # FV = g^n * (P + c * sum_{k=1..n} v^k), increasing in the rate; solved relative to the target
+        def future_value_difference(period_rate):
+            annuity, weighted_annuity, _ = calculate_coupon_stream_moments(period_rate, periods)
+            growth = (1 + period_rate) ** periods
+            value = growth * (initial_investments + contributions * annuity)
+            derivative = (periods * value - growth * contributions * weighted_annuity) / (1 + period_rate)
+            return value / target_values - 1, derivative / target_values
+        
+        needs_solver = contributions != 0
+        if needs_solver.any():
+            solved, converged = solve_safeguarded_newton(
+                future_value_difference, lower=-0.99 / periods_per_year, upper=1.0,
+                initial_guess=0.05 / periods_per_year
+            )
+            closed_form = np.where(needs_solver, np.where(converged, solved, np.nan), closed_form)
+        return np.where(periods > 0, closed_form * periods_per_year * 100, np.nan)
+
+def cumulative_products(initial_values, factors):
+    """Rows [x0, x0*f1, x0*f1*f2, ...] for a (rows x steps) matrix of factors"""
+    products = np.empty((factors.shape[0], factors.shape[1] + 1))
+    products[:, 0] = initial_values
+    products[:, 1:] = factors
+    return np.cumprod(products, axis=1)
+
+def calculate_real_estate_investment_improved(params):
+    """Calculate real estate investment returns with flexible rent adjustment methods, mortgage costs and inflation-adjusted management costs.
+
+    params is a dict of scalars for one property, or a batch: a list of such dicts or a dict
+    whose values are arrays (one entry per property). Appreciation, vacancy and inflation also
+    accept (properties x years) per-year paths. Property value, management costs and rent
+    come from cumulative products over a (properties x years) grid, with the rent read at
+    the last adjustment year through index masks. A single property returns lists and
+    floats; a batch returns arrays, with annual series padded with NaN after each horizon.
+    """
+    is_batch = isinstance(params, (list, tuple)) or any(np.ndim(value) > 0 for value in params.values())
+    if isinstance(params, (list, tuple)):
+        params = {key: [property_params[key] for property_params in params] for key in params[0]}
+    num_properties = max(np.shape(value)[0] if np.ndim(value) else 1 for value in params.values())
+    
+    def column(key):
+        return np.broadcast_to(np.asarray(params[key], dtype=float), num_properties)
+    
+    anni_investimento = column('anni_investimento').astype(np.int64)
+    max_anni = int(anni_investimento.max())
+    anni = np.arange(1, max_anni + 1)
+    nell_orizzonte = anni <= anni_investimento[:, None]
+    
+    # Convert percentages to decimals, the yearly drivers as (properties x years) paths
+    rivalutazione_decimal = expand_yearly_values(params['rivalutazione_annua'], num_properties, max_anni) / 100
+    inflazione_decimal = expand_yearly_values(params['inflazione_perc'], num_properties, max_anni) / 100
+    periodo_sfitto_decimal = expand_yearly_values(params['periodo_sfitto_perc'], num_properties, max_anni) / 100
+    manutenzione_decimal = column('manutenzione_straordinaria_perc') / 100
+    tassazione_decimal = column('tassazione_affitti_perc') / 100
+    
+    # Convert cost percentages to decimals
+    costi_assicurazione_decimal = column('costi_assicurazione_perc') / 100
+    tassa_catastale_decimal = column('tassa_catastale_perc') / 100
+    
+    valore_immobile = column('valore_immobile')
+    affitto_lordo = column('affitto_lordo')
+    costi_gestione_euro = column('costi_gestione_euro')
+    anni_restanti_mutuo = column('anni_restanti_mutuo')
+    adeguamento_affitto_anni = column('adeguamento_affitto_anni').astype(np.int64)
+    tipo_adeguamento = np.broadcast_to(np.asarray(params['tipo_adeguamento']), num_properties)
+    
+    # Property value, management costs and price index: cumulative products of the yearly factors
+    valori = cumulative_products(valore_immobile, 1 + rivalutazione_decimal)
+    valori_annuali = valori[:, 1:]
+    costi_gestione_annuali = cumulative_products(costi_gestione_euro, 1 + inflazione_decimal)[:, 1:]
+    indice_prezzi = cumulative_products(np.ones(num_properties), 1 + inflazione_decimal)
+    
+    # Rent is set at the last adjustment year (0 = never adjusted yet)
+    adeguamenti = anni // adeguamento_affitto_anni[:, None]
+    anno_ultimo_adeguamento = adeguamenti * adeguamento_affitto_anni[:, None]
+    rapporto_affitto_iniziale = affitto_lordo / valore_immobile
+    affitto_valore = np.where(
+        adeguamenti > 0,
+        np.take_along_axis(valori, anno_ultimo_adeguamento, axis=1) * rapporto_affitto_iniziale[:, None],
+        affitto_lordo[:, None]
+    )
+    affitto_inflazione = np.take_along_axis(indice_prezzi, anno_ultimo_adeguamento, axis=1) * affitto_lordo[:, None]
+    affitti_lordi_annuali = np.select(
+        [tipo_adeguamento[:, None] == "Valore Immobile", tipo_adeguamento[:, None] == "Inflazione"],
+        [affitto_valore, affitto_inflazione],
+        affitto_lordo[:, None]
+    )
+    
+    # Mortgage cost while the mortgage is still running
+    rata_mutuo_annua = np.maximum(column('rata_mutuo_mensile'), 0) * 12
+    costi_mutuo_annuali = np.where(anni <= anni_restanti_mutuo[:, None], rata_mutuo_annua[:, None], 0.0)
+    
+    # Costs as percentages of the current property value, taxes on the effective rent
+    costi_assicurazione_correnti = valori_annuali * costi_assicurazione_decimal[:, None]
+    tassa_catastale_corrente = valori_annuali * tassa_catastale_decimal[:, None]
+    affitto_effettivo = affitti_lordi_annuali * (1 - periodo_sfitto_decimal)
+    tasse_affitto = affitto_effettivo * tassazione_decimal[:, None]
+    manutenzione_annua = valori_annuali * manutenzione_decimal[:, None]
+    costi_totali_annui = (costi_assicurazione_correnti + costi_gestione_annuali + 
+                          manutenzione_annua + tassa_catastale_corrente + 
+                          tasse_affitto + costi_mutuo_annuali)
+    affitti_netti_annuali = affitto_effettivo - costi_totali_annui
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rendimenti_annuali = np.where(valore_immobile[:, None] > 0,
+                                      affitti_netti_annuali / valore_immobile[:, None] * 100, 0.0)
+        
+        # Final calculations, reading each property at its own horizon
+        def at_horizon(values):
+            return np.take_along_axis(values, anni_investimento[:, None] - 1, axis=1)[:, 0]
+        
+        def total(values):
+            return np.cumsum(np.where(nell_orizzonte, values, 0.0), axis=1)[:, -1]
+        
+        valore_finale_nominale = at_horizon(valori_annuali)
+        valore_finale_reale = valore_finale_nominale / at_horizon(indice_prezzi[:, 1:])
+        totale_affitti_netti = total(affitti_netti_annuali)
+        totale_costi_mutuo = total(costi_mutuo_annuali)
+        rendimento_medio_annuo = total(rendimenti_annuali) / anni_investimento
+        
+        guadagno_capitale_nominale = valore_finale_nominale - valore_immobile
+        guadagno_capitale_reale = valore_finale_reale - valore_immobile
+        
+        # Real value of the net rents: each year discounted by cumulative inflation
+        totale_affitti_netti_reale = total(affitti_netti_annuali / indice_prezzi[:, 1:])
+        
+        rendimento_totale_nominale = totale_affitti_netti + guadagno_capitale_nominale
+        rendimento_totale_reale = totale_affitti_netti_reale + guadagno_capitale_reale
+        
+        cagr_nominale = np.where(valore_immobile > 0, ((valore_finale_nominale + totale_affitti_netti) / valore_immobile) ** (1 / anni_investimento) - 1, 0.0)
+        cagr_reale = np.where(valore_immobile > 0, ((valore_finale_reale + totale_affitti_netti_reale) / valore_immobile) ** (1 / anni_investimento) - 1, 0.0)
+        
+        # Rent and management costs growth
+        affitto_finale = at_horizon(affitti_lordi_annuali)
+        crescita_affitto_totale = np.where(affitto_lordo > 0, ((affitto_finale / affitto_lordo) - 1) * 100, 0.0)
+        crescita_affitto_annua = np.where(affitto_lordo > 0, ((affitto_finale / affitto_lordo) ** (1 / anni_investimento) - 1) * 100, 0.0)
+        costi_gestione_finali = at_horizon(costi_gestione_annuali)
+        crescita_costi_gestione = np.where(costi_gestione_euro > 0, ((costi_gestione_finali / costi_gestione_euro) - 1) * 100, 0.0)
+    
+    def annual_output(values):
+        values = np.where(nell_orizzonte, values, np.nan)
+        return values if is_batch else values[0, :anni_investimento[0]].tolist()
+    
+    def final_output(values):
+        return values if is_batch else float(values[0])
+    
+    return {
+        'valori_annuali': annual_output(valori_annuali),
+        'affitti_lordi_annuali': annual_output(affitti_lordi_annuali),
+        'affitti_netti_annuali': annual_output(affitti_netti_annuali),
+        'rendimenti_annuali': annual_output(rendimenti_annuali),
+        'costi_gestione_annuali': annual_output(costi_gestione_annuali),
+        'costi_mutuo_annuali': annual_output(costi_mutuo_annuali),
+        'valore_finale_nominale': final_output(valore_finale_nominale),
+        'valore_finale_reale': final_output(valore_finale_reale),
+        'totale_affitti_netti': final_output(totale_affitti_netti),
+        'totale_affitti_netti_reale': final_output(totale_affitti_netti_reale),
+        'totale_costi_mutuo': final_output(totale_costi_mutuo),
+        'rendimento_medio_annuo': final_output(rendimento_medio_annuo),
+        'guadagno_capitale_nominale': final_output(guadagno_capitale_nominale),
+        'guadagno_capitale_reale': final_output(guadagno_capitale_reale),
+        'rendimento_totale_nominale': final_output(rendimento_totale_nominale),
+        'rendimento_totale_reale': final_output(rendimento_totale_reale),
+        'cagr_nominale': final_output(cagr_nominale),
+        'cagr_reale': final_output(cagr_reale),
+        'affitto_finale': final_output(affitto_finale),
+        'crescita_affitto_totale': final_output(crescita_affitto_totale),
+        'crescita_affitto_annua': final_output(crescita_affitto_annua),
+        'costi_gestione_finali': final_output(costi_gestione_finali),
+        'crescita_costi_gestione': final_output(crescita_costi_gestione)
+    }
+
 def calculate_cagr(initial_capital, final_capital, years):
     """Calculate Compound Annual Growth Rate (CAGR)"""
     if initial_capital > 0 and years > 0:
@@ -178,3 +874,29 @@ def calculate_cagr(initial_capital, final_capital, years):
         return cagr, total_return
     else:
         return 0, 0
+
+def split_into_chunks(total_items, chunk_size):
+    """Sizes of the consecutive chunks needed to cover total_items"""
+    full_chunks, remainder = divmod(int(total_items), int(chunk_size))
+    return [int(chunk_size)] * full_chunks + ([remainder] if remainder else [])
+
+def run_simulation_chunks(worker, total_paths, chunk_size, seed=None, max_workers=None, **worker_arguments):
+    """Run worker(chunk_paths, seed_sequence, **worker_arguments) over chunks of paths.
+
+    Every chunk gets its own child of one SeedSequence, so results only depend on the seed
+    and the chunk size, not on the number of processes. Chunks run on a pool of spawned
+    processes (os.cpu_count() when max_workers is None), so a Streamlit rerun never forks
+    the whole server; worker must be a module-level function of a module that does not
+    import streamlit. A single chunk or max_workers=1 runs in the calling process.
+    Returns the chunk results in order.
+    """
+    chunk_sizes = split_into_chunks(total_paths, chunk_size)
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunk_worker = partial(worker, **worker_arguments)
+    
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers == 1 or len(chunk_sizes) <= 1:
+        return list(map(chunk_worker, chunk_sizes, seed_sequences))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(chunk_worker, chunk_sizes, seed_sequences))
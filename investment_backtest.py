@@ -0,0 +1,107 @@
+import os
+import numpy as np
+import pandas as pd
+from financial_utils import to_day_ordinals, month_index, add_months_to_ordinals, calculate_xirr_vectorized
+
+PRICE_COLUMN_CANDIDATES = ("Adj Close", "Close", "Price", "Prezzo", "Chiusura")
+
+def load_price_series(source, date_column=None, price_column=None):
+    """Load a daily price series from a CSV, Parquet or NumPy (.npy) file.
+
+    source is a path or an uploaded file object with a name. CSV and Parquet files need a
+    date column (default: the first column) and a price column (default: the first of
+    PRICE_COLUMN_CANDIDATES found, else the last column). .npy paths are memory-mapped and
+    must hold either a structured array with 'date' and 'price' fields or an (n, 2) array
+    of day ordinals since 1970-01-01 and prices. Returns (day_ordinals, prices) sorted by date.
+    """
+    name = source if isinstance(source, (str, os.PathLike)) else getattr(source, 'name', '')
+    extension = os.path.splitext(str(name))[1].lower()
+    
+    if extension == ".npy":
+        data = np.load(source, mmap_mode='r' if isinstance(source, (str, os.PathLike)) else None)
+        if data.dtype.names:
+            day_ordinals = to_day_ordinals(data['date']) if data['date'].dtype.kind == 'M' else data['date']
+            prices = data['price']
+        elif data.ndim == 2 and data.shape[1] == 2:
+            day_ordinals, prices = data[:, 0], data[:, 1]
+        else:
+            raise ValueError("Il file .npy deve contenere le colonne data e prezzo!")
+    elif extension in (".csv", ".parquet"):
+        frame = pd.read_csv(source) if extension == ".csv" else pd.read_parquet(source)
+        date_column = date_column or frame.columns[0]
+        if price_column is None:
+            price_column = next((column for column in PRICE_COLUMN_CANDIDATES if column in frame.columns),
+                                frame.columns[-1])
+        day_ordinals = to_day_ordinals(pd.to_datetime(frame[date_column]).to_numpy())
+        prices = pd.to_numeric(frame[price_column], errors='coerce').to_numpy()
+    else:
+        raise ValueError(f"Formato file non supportato: {extension or name}")
+    
+    day_ordinals = np.asarray(day_ordinals, dtype=np.int64)
+    prices = np.asarray(prices, dtype=float)
+    usable = np.isfinite(prices) & (prices > 0)
+    order = np.argsort(day_ordinals[usable], kind='stable')
+    return day_ordinals[usable][order], prices[usable][order]
+
+def calculate_money_weighted_return(flow_day_ordinals, flow_amounts, final_day_ordinal, final_value):
+    """Annual money-weighted return (in %) of contributions that grew into final_value.
+
+    This is the XIRR of the contributions as deposits and final_value as the closing flow;
+    NaN when it cannot be solved.
+    """
+    day_ordinals = np.append(np.asarray(flow_day_ordinals, dtype=np.int64), final_day_ordinal)
+    amounts = np.append(-np.asarray(flow_amounts, dtype=float), final_value)
+    return float(calculate_xirr_vectorized(day_ordinals, amounts, [0, amounts.size])['xirr'][0])
+
+def backtest_recurring_investment(day_ordinals, prices, initial_investment, recurring_investment,
+                                  frequency="Annuale", start_date=None, end_date=None):
+    """Replay a recurring investment plan against a historical price series.
+
+    The initial investment buys on the first trading day from start_date; each recurring
+    contribution (recurring_investment per year, split in twelve when frequency is "Mensile")
+    buys on the first trading day on or after its scheduled date. Units are accumulated with
+    bincount/cumsum over the whole series. Returns the daily wealth and invested curves,
+    the money-weighted return and the maximum drawdown of the price series.
+    """
+    day_ordinals = np.asarray(day_ordinals, dtype=np.int64)
+    prices = np.asarray(prices, dtype=float)
+    window = np.ones(day_ordinals.size, dtype=bool)
+    if start_date is not None:
+        window &= day_ordinals >= to_day_ordinals(start_date)
+    if end_date is not None:
+        window &= day_ordinals <= to_day_ordinals(end_date)
+    day_ordinals, prices = day_ordinals[window], prices[window]
+    if day_ordinals.size < 2:
+        raise ValueError("La serie storica deve contenere almeno due prezzi nel periodo selezionato!")
+    
+    months_step = 1 if frequency == "Mensile" else 12
+    contribution = recurring_investment * months_step / 12
+    total_months = int(month_index(day_ordinals[-1]) - month_index(day_ordinals[0]))
+    scheduled = add_months_to_ordinals(day_ordinals[0], np.arange(months_step, total_months + 1, months_step))
+    scheduled = scheduled[scheduled <= day_ordinals[-1]]
+    
+    positions = np.concatenate([[0], np.searchsorted(day_ordinals, scheduled)])
+    amounts = np.concatenate([[initial_investment], np.full(scheduled.size, contribution)])
+    if contribution == 0:
+        positions, amounts = positions[:1], amounts[:1]
+    
+    units = np.cumsum(np.bincount(positions, weights=amounts / prices[positions], minlength=prices.size))
+    invested = np.cumsum(np.bincount(positions, weights=amounts, minlength=prices.size))
+    wealth = units * prices
+    
+    drawdown = prices / np.maximum.accumulate(prices) - 1
+    trough = int(np.argmin(drawdown))
+    
+    return {
+        'dates': day_ordinals.astype("datetime64[D]"),
+        'wealth': wealth,
+        'invested': invested,
+        'final_value': wealth[-1],
+        'total_invested': invested[-1],
+        'num_contributions': amounts.size,
+        'money_weighted_return': calculate_money_weighted_return(
+            day_ordinals[positions], amounts, day_ordinals[-1], wealth[-1]
+        ),
+        'max_drawdown': drawdown[trough] * 100,
+        'max_drawdown_date': day_ordinals[trough].astype("datetime64[D]")
+    }
@@ -1,5 +1,13 @@
 import streamlit as st
-from financial_utils import calculate_compound_interest, calculate_cagr
+import numpy as np
+import pandas as pd
+import altair as alt
+from financial_utils import (
+    calculate_cagr, calculate_compound_interest_trajectory, expand_yearly_values,
+    solve_compound_interest_goal, calculate_rolling_cagr, calculate_xirr_vectorized, to_day_ordinals
+)
+from investment_backtest import load_price_series, backtest_recurring_investment
+from investment_simulation import RETURN_DISTRIBUTIONS, simulate_investment_returns
 from ui_components import format_currency, format_percentage
 
 def render_compound_interest_section():
@@ -68,8 +76,21 @@ def render_compound_interest_section():
                 help="Tasso di inflazione medio atteso per il periodo"
             )
             
+            inflation_path_text = st.text_input(
+                "Inflazione per Anno (%, opzionale)",
+                value="",
+                key="compound_inflation_path",
+                help="Valori separati da virgola, ad es. proiezioni BCE; l'ultimo valore vale per gli anni successivi"
+            )
+            rate_path_text = st.text_input(
+                "Rendimento per Anno (%, opzionale)",
+                value="",
+                key="compound_rate_path",
+                help="Valori separati da virgola; se vuoto si usa il tasso di interesse annuo"
+            )
+            
             # Calcolo automatico del rendimento reale
-            real_return = interest_rate_annual - inflation_rate
+            real_return = ((1 + interest_rate_annual / 100) / (1 + inflation_rate / 100) - 1) * 100
             if real_return >= 0:
                 st.success(f"📈 **Rendimento Reale:** {format_percentage(real_return)}")
             else:
@@ -77,21 +98,131 @@ def render_compound_interest_section():
                 st.warning("⚠️ Rendimento negativo dopo inflazione!")
             
             st.write("**ℹ️ Note:**")
-            st.write("• Rendimento reale = Rendimento nominale - Inflazione")
+            st.write("• Rendimento reale = (1 + Rendimento nominale) / (1 + Inflazione) - 1")
             st.write("• Valori reali mostrano il potere d'acquisto effettivo")
         
         if st.button("📊 Calcola Interesse Composto con Inflazione", key="calc_compound"):
             try:
+                inflation_path = parse_yearly_path(inflation_path_text, None)
+                rate_path = parse_yearly_path(rate_path_text, None)
                 results = calculate_compound_interest_with_inflation(
                     initial_investment, interest_rate_annual, investment_years, 
-                    recurring_investment, inflation_rate, recurring_frequency
+                    recurring_investment, inflation_rate, recurring_frequency,
+                    rate_path=rate_path, inflation_path=inflation_path
                 )
+                # Average of the yearly rates actually applied within the horizon
+                average_rate = (interest_rate_annual if rate_path is None else
+                                float(np.mean(expand_yearly_values(np.atleast_2d(rate_path), 1, investment_years))))
                 display_compound_interest_results_with_inflation(
-                    results, interest_rate_annual, inflation_rate, investment_years
+                    results, average_rate, results['inflation_rate'], investment_years
                 )
+                display_compound_interest_trajectory(results['trajectory'])
             except Exception as e:
                 st.error("Errore nel calcolo. Verifica i valori inseriti.")
                 st.exception(e)
+        
+        st.write("**🎯 Obiettivo di Capitale: cosa serve per raggiungerlo?**")
+        goal_col1, goal_col2 = st.columns(2)
+        
+        with goal_col1:
+            goal_unknown = st.selectbox(
+                "Grandezza da Calcolare",
+                ["Tasso Annuo", "Versamento Annuo", "Durata (Anni)"],
+                key="compound_goal_unknown",
+                help="Le altre grandezze sono prese dai parametri inseriti sopra"
+            )
+        
+        with goal_col2:
+            goal_targets_text = st.text_input(
+                "Capitali Obiettivo (€, separati da virgola)",
+                value="25000, 50000, 100000",
+                key="compound_goal_targets"
+            )
+        
+        if st.button("🎯 Calcola Obiettivi", key="calc_compound_goal"):
+            try:
+                goal_targets = [float(value.strip()) for value in goal_targets_text.split(",") if value.strip()]
+                if not goal_targets:
+                    raise ValueError("Inserire almeno un capitale obiettivo!")
+                solved = solve_compound_interest_goal(
+                    goal_unknown, goal_targets, initial_investment, interest_rate_annual,
+                    investment_years, recurring_investment, recurring_frequency
+                )
+                display_compound_interest_goals(goal_targets, solved, goal_unknown)
+            except Exception as e:
+                st.error(f"Errore nel calcolo degli obiettivi: {str(e)}")
+        
+        st.write("**🎲 Simulazione Monte Carlo dei Rendimenti**")
+        st.caption("Il tasso di interesse annuo inserito sopra è usato come rendimento atteso")
+        mc_col1, mc_col2, mc_col3 = st.columns(3)
+        
+        with mc_col1:
+            return_distribution = st.radio(
+                "Distribuzione dei Rendimenti", list(RETURN_DISTRIBUTIONS), key="compound_mc_distribution"
+            )
+            if return_distribution == "Lognormale":
+                return_volatility = st.number_input(
+                    "Volatilità Annua (%)", min_value=0.0, max_value=100.0, value=15.0, step=0.5,
+                    key="compound_mc_volatility"
+                )
+                historical_returns_text = ""
+            else:
+                return_volatility = 0.0
+                historical_returns_text = st.text_area(
+                    "Rendimenti Storici Annui (%, separati da virgola)",
+                    value="12.5, -4.2, 18.3, 7.1, -15.6, 22.4, 9.8, 3.2, -8.9, 14.7",
+                    help="Valori di esempio: sostituirli con la serie storica dello strumento analizzato",
+                    key="compound_mc_history"
+                )
+        
+        with mc_col2:
+            num_simulations = st.select_slider(
+                "Numero di Simulazioni", options=[10000, 50000, 100000, 250000, 500000, 1000000],
+                value=100000, key="compound_mc_paths"
+            )
+            wealth_goal = st.number_input(
+                "Obiettivo di Capitale (€)", min_value=0.0, value=30000.0, step=1000.0, key="compound_mc_goal"
+            )
+        
+        with mc_col3:
+            simulation_seed = st.number_input(
+                "Seme Casuale", min_value=0, value=42, step=1, key="compound_mc_seed",
+                help="Lo stesso seme riproduce esattamente gli stessi risultati"
+            )
+        
+        if st.button("🎲 Simula Rendimenti", key="calc_compound_mc"):
+            try:
+                historical_returns = [float(value.strip()) for value in historical_returns_text.split(",") if value.strip()]
+                with st.spinner("Simulazione in corso..."):
+                    simulation = simulate_investment_returns(
+                        initial_investment, recurring_investment, investment_years, return_distribution,
+                        interest_rate_annual, return_volatility, historical_returns, recurring_frequency,
+                        num_simulations, wealth_goal, inflation_rate, seed=simulation_seed
+                    )
+                display_investment_simulation(simulation, wealth_goal)
+            except Exception as e:
+                st.error(f"Errore nella simulazione: {str(e)}")
+        
+        st.write("**🕰️ Backtest su Serie Storica**")
+        st.caption("Ripete il piano di investimento (somma iniziale e versamenti ricorrenti) sui prezzi storici di un indice")
+        price_file = st.file_uploader(
+            "File Prezzi Giornalieri (CSV, Parquet o NPY)", type=["csv", "parquet", "npy"],
+            help="CSV/Parquet: prima colonna data, prezzo in 'Adj Close', 'Close', 'Prezzo' o ultima colonna. "
+                 "NPY: colonne giorni dal 1970-01-01 e prezzo",
+            key="compound_backtest_file"
+        )
+        
+        if st.button("🕰️ Esegui Backtest", key="calc_compound_backtest"):
+            try:
+                if price_file is None:
+                    raise ValueError("Caricare un file con la serie storica dei prezzi!")
+                day_ordinals, prices = load_price_series(price_file)
+                backtest = backtest_recurring_investment(
+                    day_ordinals, prices, initial_investment, recurring_investment, recurring_frequency
+                )
+                display_backtest_results(backtest)
+            except Exception as e:
+                st.error(f"Errore nel backtest: {str(e)}")
 
 def render_cagr_section():
     """Render CAGR calculator section"""
@@ -138,55 +269,138 @@ def render_cagr_section():
             except Exception as e:
                 st.error("Errore nel calcolo. Verifica i valori inseriti.")
                 st.exception(e)
+        
+        st.write("**📉 CAGR Mobile su Serie Storica**")
+        rolling_col1, rolling_col2 = st.columns(2)
+        
+        with rolling_col1:
+            rolling_price_file = st.file_uploader(
+                "File Prezzi Giornalieri (CSV, Parquet o NPY)", type=["csv", "parquet", "npy"],
+                key="cagr_rolling_file"
+            )
+        
+        with rolling_col2:
+            rolling_windows = st.multiselect(
+                "Finestre (Anni)", [1, 3, 5, 10, 15, 20], default=[1, 3, 5, 10], key="cagr_rolling_windows"
+            )
+        
+        if st.button("📉 Calcola CAGR Mobile", key="calc_cagr_rolling"):
+            try:
+                if rolling_price_file is None:
+                    raise ValueError("Caricare un file con la serie storica dei prezzi!")
+                if not rolling_windows:
+                    raise ValueError("Selezionare almeno una finestra!")
+                day_ordinals, prices = load_price_series(rolling_price_file)
+                rolling = calculate_rolling_cagr(day_ordinals, prices, sorted(rolling_windows))
+                display_rolling_cagr(rolling)
+            except Exception as e:
+                st.error(f"Errore nel calcolo del CAGR mobile: {str(e)}")
+        
+        st.write("**📆 Rendimento Ponderato per il Denaro (XIRR) da Flussi Irregolari**")
+        st.caption("Versamenti con segno negativo, prelievi e valore finale del conto con segno positivo")
+        flows = st.data_editor(
+            pd.DataFrame({
+                'Data': pd.to_datetime(["2020-01-15", "2021-06-30", "2022-03-10", "2024-12-31"]),
+                'Importo (€)': [-10000.0, -5000.0, 2000.0, 16500.0]
+            }),
+            num_rows="dynamic",
+            key="cagr_xirr_flows"
+        )
+        
+        if st.button("📆 Calcola XIRR", key="calc_cagr_xirr"):
+            try:
+                flows = flows.dropna()
+                if len(flows) < 2:
+                    raise ValueError("Inserire almeno due flussi!")
+                result = calculate_xirr_vectorized(
+                    to_day_ordinals(pd.to_datetime(flows['Data']).to_numpy()), flows['Importo (€)'].to_numpy(),
+                    [0, len(flows)]
+                )
+                if result['converged'][0]:
+                    st.success(f"📆 **XIRR (annuo):** {format_percentage(result['xirr'][0])}")
+                else:
+                    st.error("❌ XIRR non determinabile: servono flussi di segno opposto con un rendimento plausibile.")
+            except Exception as e:
+                st.error(f"Errore nel calcolo XIRR: {str(e)}")
 
 def calculate_compound_interest_with_inflation(initial_investment, interest_rate_annual, 
                                              investment_years, recurring_investment=0, 
-                                             inflation_rate=2.0, frequency="Annuale"):
-    """Calculate future value with compound interest, recurring investments and inflation analysis"""
+                                             inflation_rate=2.0, frequency="Annuale",
+                                             rate_path=None, inflation_path=None):
+    """Calculate future value with compound interest, recurring investments and inflation analysis.
+
+    As in calculate_compound_interest_trajectory, every argument may be a per-scenario array
+    and interest_rate_annual and inflation_rate may be (scenarios x years) matrices.
+    rate_path and inflation_path are per-year paths (e.g. inflation projections) shared by
+    all scenarios, or (scenarios x years) matrices; when given they replace the constant
+    rates. Nominal and real values come from one fused pass over the growth and deflator
+    products. A single scenario returns scalars, a batch returns arrays.
+    """
+    interest_rates = np.asarray(interest_rate_annual if rate_path is None else np.atleast_2d(rate_path), dtype=float)
+    inflation_rates = np.asarray(inflation_rate if inflation_path is None else np.atleast_2d(inflation_path), dtype=float)
+    is_batch = (any(np.ndim(values) > 0 for values in (
+        initial_investment, interest_rate_annual, investment_years, recurring_investment, inflation_rate
+    )) or any(np.ndim(path) == 2 and np.shape(path)[0] > 1 for path in (rate_path, inflation_path)))
     
-    # Calcoli nominali (senza considerare inflazione)
-    if frequency == "Mensile":
-        base_results = calculate_compound_interest_monthly(
-            initial_investment, interest_rate_annual, investment_years, recurring_investment
-        )
-    else:
-        base_results = calculate_compound_interest(
-            initial_investment, interest_rate_annual, investment_years, recurring_investment
-        )
+    trajectory = calculate_compound_interest_trajectory(
+        initial_investment, interest_rates, investment_years, recurring_investment, inflation_rates, frequency
+    )
     
-    # Calcoli reali (considerando inflazione)
-    real_interest_rate = interest_rate_annual - inflation_rate
-    if frequency == "Mensile":
-        real_results = calculate_compound_interest_monthly(
-            initial_investment, real_interest_rate, investment_years, recurring_investment
-        )
-    else:
-        real_results = calculate_compound_interest(
-            initial_investment, real_interest_rate, investment_years, recurring_investment
-        )
+    periods_per_year = 12 if frequency == "Mensile" else 1
+    num_plans = trajectory['balance'].shape[0]
+    years = np.broadcast_to(np.asarray(investment_years, dtype=float), num_plans)
+    final_period = np.round(years * periods_per_year).astype(np.int64)[:, None]
+    
+    def at_horizon(values):
+        return np.take_along_axis(values, final_period, axis=1)[:, 0]
     
-    # Calcolo del potere d'acquisto del valore futuro nominale
-    inflation_factor = (1 + inflation_rate / 100) ** investment_years
-    future_value_real_purchasing_power = base_results['total_future_value'] / inflation_factor
+    nominal_value = at_horizon(trajectory['balance'])
+    growth_factor = at_horizon(trajectory['growth'])
+    inflation_factor = at_horizon(trajectory['deflator'])
+    total_invested = at_horizon(trajectory['contributions'])
+    fv_initial = np.broadcast_to(np.asarray(initial_investment, dtype=float), num_plans) * growth_factor
+    real_value = nominal_value / inflation_factor
     
-    # Calcolo di quanto denaro servirebbe oggi per avere lo stesso potere d'acquisto
-    equivalent_today_value = base_results['total_future_value'] / inflation_factor
+    def as_output(values):
+        return values if is_batch else float(values[0])
+    
+    base_results = {
+        'total_future_value': as_output(nominal_value),
+        'fv_initial': as_output(fv_initial),
+        'fv_recurring': as_output(nominal_value - fv_initial),
+        'total_invested': as_output(total_invested),
+        'total_gains': as_output(nominal_value - total_invested)
+    }
+    real_results = {
+        'total_future_value': as_output(real_value),
+        'fv_initial': as_output(fv_initial / inflation_factor),
+        'fv_recurring': as_output((nominal_value - fv_initial) / inflation_factor),
+        'total_invested': as_output(total_invested),
+        'total_gains': as_output(real_value - total_invested)
+    }
     
-    # Perdita di potere d'acquisto per l'inflazione
-    purchasing_power_loss = base_results['total_future_value'] - future_value_real_purchasing_power
+    # Annualised real rate and average inflation implied by the cumulative factors
+    real_interest_rate = ((growth_factor / inflation_factor) ** (1 / years) - 1) * 100
+    average_inflation = (inflation_factor ** (1 / years) - 1) * 100
     
     return {
         'nominal_results': base_results,
         'real_results': real_results,
-        'real_interest_rate': real_interest_rate,
-        'inflation_factor': inflation_factor,
-        'future_value_real_purchasing_power': future_value_real_purchasing_power,
-        'equivalent_today_value': equivalent_today_value,
-        'purchasing_power_loss': purchasing_power_loss,
-        'inflation_rate': inflation_rate,
-        'frequency': frequency
+        'real_interest_rate': as_output(real_interest_rate),
+        'inflation_factor': as_output(inflation_factor),
+        'future_value_real_purchasing_power': as_output(real_value),
+        'equivalent_today_value': as_output(real_value),
+        'purchasing_power_loss': as_output(nominal_value - real_value),
+        'inflation_rate': as_output(average_inflation),
+        'frequency': frequency,
+        'trajectory': trajectory
     }
 
+def parse_yearly_path(text, default_value):
+    """Parse comma-separated yearly percentages, falling back to a constant value when empty"""
+    values = [float(value.strip()) for value in text.split(",") if value.strip()]
+    return np.array(values) if values else default_value
+
 def calculate_compound_interest_monthly(initial_investment, interest_rate_annual, investment_years, monthly_investment_annual=0):
     """Calculate future value with compound interest for monthly recurring investments"""
     
@@ -322,6 +536,82 @@ def display_compound_interest_results_with_inflation(results, interest_rate_annu
         else:
             st.success("✅ Buon margine contro l'inflazione")
 
+def display_compound_interest_trajectory(trajectory):
+    """Chart the balance path of a single compound interest plan"""
+    st.write("**📈 Evoluzione del Capitale:**")
+    path = pd.DataFrame({
+        'Valore Nominale (€)': trajectory['balance'][0],
+        "Valore Reale - Potere d'Acquisto (€)": trajectory['real_balance'][0],
+        'Capitale Investito (€)': trajectory['contributions'][0]
+    }, index=pd.Index(trajectory['years'], name='Anni'))
+    st.line_chart(path)
+
+def display_compound_interest_goals(goal_targets, solved, goal_unknown):
+    """Display the solved rate, contribution or horizon for each capital goal"""
+    if goal_unknown == "Tasso Annuo":
+        formatted = [format_percentage(value) if np.isfinite(value) else "Non raggiungibile" for value in solved]
+    elif goal_unknown == "Versamento Annuo":
+        formatted = [format_currency(value) if np.isfinite(value) else "Non raggiungibile" for value in solved]
+    else:
+        formatted = [f"{value:.1f}" if np.isfinite(value) else "Non raggiungibile" for value in solved]
+    
+    st.dataframe(pd.DataFrame({
+        'Capitale Obiettivo (€)': [format_currency(target) for target in goal_targets],
+        goal_unknown: formatted
+    }), hide_index=True)
+
+def display_investment_simulation(simulation, wealth_goal):
+    """Display terminal wealth percentiles, goal probability and yearly percentile bands"""
+    labels = [f"P{value}" for value in simulation['percentiles']]
+    
+    if simulation['num_paths'] < simulation['requested_paths']:
+        effective_paths = f"{simulation['num_paths']:,}".replace(",", ".")
+        st.info(f"ℹ️ Simulazioni ridotte a {effective_paths} per contenere i tempi di calcolo "
+                f"(piano mensile o durata lunga)")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write(f"**📊 Capitale Finale su {simulation['num_paths']:,} simulazioni:**".replace(",", "."))
+        st.dataframe(pd.DataFrame({
+            'Valore Nominale (€)': simulation['terminal_percentiles'],
+            'Valore Reale (€)': simulation['real_terminal_percentiles']
+        }, index=labels).round(2))
+    
+    with col2:
+        st.write("**🎯 Obiettivo:**")
+        st.write(f"• Probabilità di raggiungere {format_currency(wealth_goal)}: "
+                 f"**{format_percentage(simulation['goal_probability'] * 100)}**")
+        st.write(f"• Capitale Medio Finale: {format_currency(simulation['mean_terminal_wealth'])}")
+        st.write(f"• Capitale Investito: {format_currency(simulation['total_invested'])}")
+    
+    bands = pd.DataFrame(simulation['yearly_percentiles'].T, columns=labels)
+    bands.index.name = 'Anni'
+    st.line_chart(bands)
+
+def display_backtest_results(backtest):
+    """Display the wealth curve and the summary metrics of a historical backtest"""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**💰 Risultato del Piano:**")
+        st.write(f"• **Valore Finale: {format_currency(backtest['final_value'])}**")
+        st.write(f"• Capitale Investito: {format_currency(backtest['total_invested'])}")
+        st.write(f"• Numero Versamenti: {backtest['num_contributions']}")
+    
+    with col2:
+        st.write("**📊 Rendimento e Rischio:**")
+        st.write(f"• **Rendimento Ponderato per il Denaro (annuo): {format_percentage(backtest['money_weighted_return'])}**")
+        drawdown_date = pd.Timestamp(backtest['max_drawdown_date']).strftime('%d/%m/%Y')
+        st.write(f"• Massimo Drawdown dell'Indice: {format_percentage(backtest['max_drawdown'])} ({drawdown_date})")
+        st.write(f"• Periodo: {pd.Timestamp(backtest['dates'][0]).strftime('%d/%m/%Y')} - "
+                 f"{pd.Timestamp(backtest['dates'][-1]).strftime('%d/%m/%Y')}")
+    
+    st.line_chart(pd.DataFrame({
+        'Valore del Portafoglio (€)': backtest['wealth'],
+        'Capitale Investito (€)': backtest['invested']
+    }, index=pd.DatetimeIndex(backtest['dates'], name='Data')))
+
 def display_cagr_results(results):
     """Display CAGR calculation results"""
     st.success("**Risultati CAGR:**")
@@ -359,3 +649,26 @@ def display_cagr_results(results):
         # Investment efficiency
         roi_percentage = (results['absolute_gain'] / results['initial_capital']) * 100 if results['initial_capital'] > 0 else 0
         st.write(f"• ROI Totale: {format_percentage(roi_percentage)}")
+
+def display_rolling_cagr(rolling):
+    """Display the distribution of rolling CAGRs for each window length"""
+    columns = [f"{years} anni" if years > 1 else "1 anno" for years in rolling['window_years']]
+    cagr = pd.DataFrame(rolling['cagr'] * 100, columns=columns,
+                        index=pd.DatetimeIndex(rolling['start_dates'], name='Data Inizio'))
+    
+    summary = cagr.describe(percentiles=[0.05, 0.25, 0.5, 0.75, 0.95]).T
+    summary['% Finestre Positive'] = (cagr > 0).sum() / cagr.notna().sum() * 100
+    summary = summary.rename(columns={'count': 'Finestre', 'mean': 'Media', 'std': 'Dev. Std', 'min': 'Minimo',
+                                      'max': 'Massimo', '5%': 'P5', '25%': 'P25', '50%': 'Mediana',
+                                      '75%': 'P75', '95%': 'P95'})
+    st.write("**📊 Statistiche del CAGR Mobile (%):**")
+    st.dataframe(summary.round(2))
+    
+    distribution = cagr.melt(var_name='Finestra', value_name='CAGR (%)').dropna()
+    histogram = alt.Chart(distribution).mark_bar(opacity=0.6).encode(
+        x=alt.X('CAGR (%):Q', bin=alt.Bin(maxbins=60), title="CAGR Annuo (%)"),
+        y=alt.Y('count():Q', stack=None, title="Numero di Finestre"),
+        color=alt.Color('Finestra:N', sort=columns)
+    )
+    st.altair_chart(histogram)
+    st.line_chart(cagr)
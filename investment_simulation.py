@@ -0,0 +1,109 @@
+import numpy as np
+from financial_utils import run_simulation_chunks, split_into_chunks
+
+# Upper bound on the number of (path, period) cells held in memory by one chunk
+SIMULATION_CHUNK_ELEMENTS = 2_000_000
+# Upper bound on the (path, period) cells of a whole simulation, so that it stays fast enough
+# for a Streamlit rerun: monthly plans over long horizons get fewer paths
+MAX_SIMULATION_ELEMENTS = 36_000_000
+# Number of paths whose yearly wealth is kept to estimate the percentile bands over time
+BAND_SAMPLE_PATHS = 20000
+
+def draw_lognormal_log_returns(num_paths, num_years, periods_per_year, rng, expected_return, volatility):
+    """Per-period lognormal log returns with the given annual expected return and volatility (in %).
+
+    The expected return compounds at expected_return / periods_per_year per period, as in the
+    deterministic calculators, so with zero volatility every path matches them exactly.
+    """
+    period_sigma = volatility / 100 / np.sqrt(periods_per_year)
+    period_mu = np.log1p(expected_return / 100 / periods_per_year) - period_sigma ** 2 / 2
+    num_periods = num_years * periods_per_year
+    return rng.normal(period_mu, period_sigma, (num_paths, num_periods))
+
+def draw_bootstrap_log_returns(num_paths, num_years, periods_per_year, rng, historical_returns):
+    """Per-period log returns resampling whole historical annual returns (in %) with replacement.
+
+    Each drawn year is spread evenly over its periods, so monthly plans keep the annual draw.
+    """
+    historical_log_returns = np.log1p(np.asarray(historical_returns, dtype=float) / 100)
+    yearly = rng.choice(historical_log_returns, size=(num_paths, num_years))
+    return np.repeat(yearly / periods_per_year, periods_per_year, axis=1)
+
+RETURN_DISTRIBUTIONS = {
+    "Lognormale": draw_lognormal_log_returns,
+    "Bootstrap Storico": draw_bootstrap_log_returns
+}
+
+def simulate_wealth_chunk(num_paths, seed_sequence, initial_investment, recurring_investment, num_years,
+                          periods_per_year, distribution, distribution_arguments, band_paths):
+    """Simulate one chunk of wealth paths with contributions at the end of each period.
+
+    With G_k the cumulative growth after k periods, wealth is W_k = G_k * (W_0 + c * sum_{j<=k} 1/G_j),
+    evaluated with cumulative sums across the whole chunk. Returns the terminal wealth of every
+    path and the yearly wealth of the first band_paths paths.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    log_returns = RETURN_DISTRIBUTIONS[distribution](
+        num_paths, num_years, periods_per_year, rng, **distribution_arguments
+    )
+    growth = np.exp(np.cumsum(log_returns, axis=1))
+    contribution = recurring_investment / periods_per_year
+    wealth = growth * (initial_investment + contribution * np.cumsum(1 / growth, axis=1))
+    
+    sample = wealth[:band_paths, periods_per_year - 1::periods_per_year]
+    return {
+        'terminal_wealth': wealth[:, -1],
+        'yearly_wealth': np.hstack([np.full((sample.shape[0], 1), float(initial_investment)), sample])
+    }
+
+def simulate_investment_returns(initial_investment, recurring_investment, investment_years, distribution="Lognormale",
+                                expected_return=5.0, volatility=15.0, historical_returns=None, frequency="Annuale",
+                                num_paths=100000, goal=None, inflation_rate=0.0,
+                                percentiles=(5, 25, 50, 75, 95), seed=None, max_workers=None):
+    """Monte Carlo distribution of terminal wealth for a compound interest plan.
+
+    Returns are lognormal (expected_return and volatility in %) or bootstrapped from
+    historical annual returns (in %). Paths are simulated in chunks of bounded size with a
+    seeded Generator per chunk, spread over a process pool (see run_simulation_chunks).
+    The path count is capped so that paths x periods stays within MAX_SIMULATION_ELEMENTS.
+    Yearly percentile bands are estimated on a sample of BAND_SAMPLE_PATHS paths, terminal
+    percentiles and the probability of reaching the goal on all paths.
+    """
+    if distribution not in RETURN_DISTRIBUTIONS:
+        raise ValueError(f"Distribuzione dei rendimenti non supportata: {distribution}")
+    num_years = int(investment_years)
+    if num_years <= 0 or num_paths <= 0:
+        raise ValueError("Durata e numero di simulazioni devono essere positivi!")
+    if distribution == "Lognormale":
+        distribution_arguments = {'expected_return': expected_return, 'volatility': volatility}
+    else:
+        if historical_returns is None or len(historical_returns) == 0:
+            raise ValueError("Inserire almeno un rendimento storico per il bootstrap!")
+        distribution_arguments = {'historical_returns': np.asarray(historical_returns, dtype=float)}
+    
+    periods_per_year = 12 if frequency == "Mensile" else 1
+    requested_paths = int(num_paths)
+    num_paths = min(requested_paths, max(MAX_SIMULATION_ELEMENTS // (num_years * periods_per_year), 1))
+    chunk_size = max(SIMULATION_CHUNK_ELEMENTS // (num_years * periods_per_year), 1)
+    num_chunks = len(split_into_chunks(num_paths, chunk_size))
+    chunks = run_simulation_chunks(
+        simulate_wealth_chunk, num_paths, chunk_size, seed=seed, max_workers=max_workers,
+        initial_investment=initial_investment, recurring_investment=recurring_investment,
+        num_years=num_years, periods_per_year=periods_per_year, distribution=distribution,
+        distribution_arguments=distribution_arguments, band_paths=-(-BAND_SAMPLE_PATHS // num_chunks)
+    )
+    terminal_wealth = np.concatenate([chunk['terminal_wealth'] for chunk in chunks])
+    yearly_wealth = np.concatenate([chunk['yearly_wealth'] for chunk in chunks])
+    deflator = (1 + inflation_rate / 100) ** num_years
+    
+    return {
+        'percentiles': np.asarray(percentiles),
+        'terminal_percentiles': np.percentile(terminal_wealth, percentiles),
+        'real_terminal_percentiles': np.percentile(terminal_wealth, percentiles) / deflator,
+        'yearly_percentiles': np.percentile(yearly_wealth, percentiles, axis=0),
+        'mean_terminal_wealth': terminal_wealth.mean(),
+        'goal_probability': (terminal_wealth >= goal).mean() if goal is not None else None,
+        'total_invested': initial_investment + recurring_investment * num_years,
+        'num_paths': terminal_wealth.size,
+        'requested_paths': requested_paths
+    }
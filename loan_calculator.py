@@ -1,5 +1,11 @@
 import streamlit as st
-from financial_utils import calculate_loan_payment
+import math
+import warnings
+import numpy as np
+import pandas as pd
+import altair as alt
+from financial_utils import calculate_loan_payment, calculate_loan_payment_vectorized, calculate_taeg_vectorized
+from mortgage_simulation import SHORT_RATE_MODELS, simulate_variable_rate_mortgage
 from ui_components import format_currency, format_percentage
 
 def render_loan_section():
@@ -28,15 +34,6 @@ def render_loan_section():
             )
         
         with col2:
-            taeg_annual = st.number_input(
-                "TAEG Annuo (%)", 
-                min_value=0.0, 
-                max_value=50.0,
-                value=3.8,
-                step=0.1,
-                key="loan_taeg"
-            )
-            
             loan_duration_years = st.number_input(
                 "Durata del Prestito (Anni)", 
                 min_value=1, 
@@ -45,24 +42,213 @@ def render_loan_section():
                 key="loan_duration"
             )
         
+        st.write("**💶 Costi Accessori (per il calcolo del TAEG):**")
+        col3, col4, col5 = st.columns(3)
+        
+        with col3:
+            upfront_fees = st.number_input(
+                "Spese Iniziali (€)", 
+                min_value=0.0, 
+                value=1500.0,
+                step=100.0,
+                help="Istruttoria, perizia e altre spese pagate all'erogazione",
+                key="loan_upfront_fees"
+            )
+        
+        with col4:
+            monthly_fees = st.number_input(
+                "Spese Mensili (€)", 
+                min_value=0.0, 
+                value=2.0,
+                step=0.5,
+                help="Spese di incasso rata e gestione pratica",
+                key="loan_monthly_fees"
+            )
+        
+        with col5:
+            monthly_insurance = st.number_input(
+                "Assicurazione Mensile (€)", 
+                min_value=0.0, 
+                value=0.0,
+                step=1.0,
+                help="Premio mensile delle polizze obbligatorie",
+                key="loan_monthly_insurance"
+            )
+        
         if st.button("Calcola Prestito", key="calc_loan"):
             try:
-                results = calculate_loan_metrics(loan_amount, tan_annual, taeg_annual, loan_duration_years)
+                results = calculate_loan_metrics(loan_amount, tan_annual, loan_duration_years=loan_duration_years,
+                                                 upfront_fees=upfront_fees, monthly_fees=monthly_fees,
+                                                 monthly_insurance=monthly_insurance)
                 display_loan_results(results)
+                
+                schedule = calculate_amortization_schedule(loan_amount, tan_annual, loan_duration_years)
+                display_amortization_schedule(schedule)
             except Exception as e:
                 st.error("Errore nel calcolo. Verifica i valori inseriti.")
                 st.exception(e)
+        
+        st.write("**⏩ Estinzione Parziale e Variazioni di Tasso**")
+        event_col1, event_col2, event_col3 = st.columns(3)
+        
+        with event_col1:
+            prepayment_amount = st.number_input(
+                "Rimborso Anticipato (€)", min_value=0.0, value=10000.0, step=1000.0, key="loan_prepayment_amount"
+            )
+            prepayment_period = st.number_input(
+                "Mese del Rimborso", min_value=1, value=24, step=1, key="loan_prepayment_period"
+            )
+        
+        with event_col2:
+            prepayment_mode = st.radio(
+                "Dopo il Rimborso", ["Riduci Rata", "Riduci Durata"], key="loan_prepayment_mode"
+            )
+            holiday_months = st.number_input(
+                "Mesi di Sospensione Quota Capitale", min_value=0, value=0, step=1,
+                help="Mesi consecutivi, a partire dal mese del rimborso, in cui si pagano solo gli interessi",
+                key="loan_holiday_months"
+            )
+        
+        with event_col3:
+            new_tan = st.number_input(
+                "Nuovo TAN (%)", min_value=0.0, max_value=50.0, value=tan_annual, step=0.1, key="loan_new_tan"
+            )
+            rate_change_period = st.number_input(
+                "Mese della Variazione", min_value=1, value=60, step=1, key="loan_rate_change_period"
+            )
+        
+        if st.button("Simula Piano con Eventi", key="calc_loan_events"):
+            try:
+                holidays = range(prepayment_period, prepayment_period + holiday_months)
+                rate_changes = {rate_change_period: new_tan} if new_tan != tan_annual else None
+                event_schedule = pd.DataFrame(iterate_loan_schedule(
+                    loan_amount, tan_annual, loan_duration_years, {prepayment_period: prepayment_amount},
+                    holidays, rate_changes, prepayment_mode
+                ))
+                base_interest = calculate_loan_metrics(
+                    loan_amount, tan_annual, loan_duration_years=loan_duration_years
+                )['total_interest']
+                display_loan_event_schedule(event_schedule, loan_duration_years * 12, base_interest)
+            except Exception as e:
+                st.error(f"Errore nella simulazione: {str(e)}")
+        
+        st.write("**🧮 Matrice Scenari (Importo × TAN × Durata)**")
+        scenario_col1, scenario_col2, scenario_col3 = st.columns(3)
+        
+        with scenario_col1:
+            scenario_amounts = st.text_input(
+                "Importi (€, separati da punto e virgola)",
+                value="100.000; 150.000; 200.000",
+                key="loan_scenario_amounts"
+            )
+        
+        with scenario_col2:
+            scenario_tan_range = st.slider(
+                "Intervallo TAN (%)", min_value=0.0, max_value=15.0, value=(1.0, 6.0), step=0.25,
+                key="loan_scenario_tan_range"
+            )
+            scenario_tan_step = st.number_input(
+                "Passo TAN (%)", min_value=0.05, value=0.25, step=0.05, key="loan_scenario_tan_step"
+            )
+        
+        with scenario_col3:
+            scenario_duration_range = st.slider(
+                "Intervallo Durata (Anni)", min_value=1, max_value=40, value=(10, 30),
+                key="loan_scenario_duration_range"
+            )
+            scenario_duration_step = st.number_input(
+                "Passo Durata (Anni)", min_value=1, value=5, step=1, key="loan_scenario_duration_step"
+            )
+        
+        if st.button("Calcola Matrice Scenari", key="calc_loan_scenarios"):
+            try:
+                amounts = parse_amount_list(scenario_amounts)
+                tan_values = np.arange(scenario_tan_range[0], scenario_tan_range[1] + scenario_tan_step / 2,
+                                       scenario_tan_step)
+                duration_values = np.arange(scenario_duration_range[0], scenario_duration_range[1] + 1,
+                                            scenario_duration_step)
+                scenarios = calculate_loan_scenario_matrix(amounts, tan_values, duration_values)
+                display_loan_scenario_matrix(scenarios)
+            except Exception as e:
+                st.error(f"Errore nel calcolo degli scenari: {str(e)}")
+        
+        st.write("**🎲 Mutuo a Tasso Variabile (Simulazione Monte Carlo)**")
+        variable_col1, variable_col2, variable_col3 = st.columns(3)
+        
+        with variable_col1:
+            euribor_initial = st.number_input(
+                "Euribor Attuale (%)", value=2.5, step=0.1, key="loan_variable_euribor"
+            )
+            euribor_long_term = st.number_input(
+                "Euribor di Lungo Periodo (%)", value=3.0, step=0.1, key="loan_variable_long_term"
+            )
+            variable_spread = st.number_input(
+                "Spread (%)", min_value=0.0, value=1.2, step=0.05, key="loan_variable_spread"
+            )
+        
+        with variable_col2:
+            rate_model = st.selectbox(
+                "Modello del Tasso", list(SHORT_RATE_MODELS), key="loan_variable_model"
+            )
+            mean_reversion = st.number_input(
+                "Velocità di Ritorno alla Media", min_value=0.0, value=0.3, step=0.05, key="loan_variable_reversion"
+            )
+            rate_volatility = st.number_input(
+                "Volatilità Annua (%)", min_value=0.0, value=1.0, step=0.1,
+                help="Per il modello CIR è la volatilità della radice del tasso",
+                key="loan_variable_volatility"
+            )
+        
+        with variable_col3:
+            reset_months = st.selectbox(
+                "Revisione del Tasso (Mesi)", [1, 3, 6, 12], key="loan_variable_reset"
+            )
+            num_paths = st.slider(
+                "Numero di Scenari", min_value=1000, max_value=100000, value=10000, step=1000,
+                key="loan_variable_paths"
+            )
+            apply_floor = st.checkbox("Floor Euribor a 0%", value=True, key="loan_variable_floor")
+        
+        if st.button("Simula Mutuo Variabile", key="calc_loan_variable"):
+            try:
+                with st.spinner("Simulazione in corso..."):
+                    simulation = simulate_variable_rate_mortgage(
+                        loan_amount, variable_spread, loan_duration_years, euribor_initial, euribor_long_term,
+                        mean_reversion, rate_volatility, rate_model, num_paths, reset_months,
+                        0.0 if apply_floor else None
+                    )
+                display_variable_rate_simulation(simulation)
+            except Exception as e:
+                st.error(f"Errore nella simulazione: {str(e)}")
+
+def calculate_loan_metrics(loan_amount, tan_annual, loan_duration_years, *, taeg_annual=None,
+                           upfront_fees=0, monthly_fees=0, monthly_insurance=0):
+    """Calculate loan payment, total costs and the TAEG implied by the cost items.
 
-def calculate_loan_metrics(loan_amount, tan_annual, taeg_annual, loan_duration_years):
-    """Calculate loan payment and total costs"""
+    taeg_annual is deprecated and ignored: the TAEG is computed from the cost items.
+    """
+    if taeg_annual is not None:
+        warnings.warn(
+            "taeg_annual è deprecato e ignorato: il TAEG è calcolato da spese iniziali, "
+            "spese mensili e assicurazione",
+            DeprecationWarning, stacklevel=2
+        )
+    if upfront_fees >= loan_amount:
+        raise ValueError("Le spese iniziali non possono superare l'importo del prestito!")
     
     # Calculate monthly payment using TAN
     monthly_payment = calculate_loan_payment(loan_amount, tan_annual, loan_duration_years)
     
+    # TAEG from the actual cash flows: net amount received against installments plus costs
+    taeg_annual = float(calculate_taeg_vectorized(
+        loan_amount, tan_annual, loan_duration_years, upfront_fees, monthly_fees, monthly_insurance
+    )[0])
+    
     # Calculate totals
     total_payments = loan_duration_years * 12
     total_loan_cost = monthly_payment * total_payments
     total_interest = total_loan_cost - loan_amount
+    total_fees = upfront_fees + (monthly_fees + monthly_insurance) * total_payments
     
     # Calculate interest percentage of total cost
     interest_percentage = (total_interest / loan_amount) * 100 if loan_amount > 0 else 0
@@ -83,9 +269,163 @@ def calculate_loan_metrics(loan_amount, tan_annual, taeg_annual, loan_duration_y
         'total_payments': total_payments,
         'interest_percentage': interest_percentage,
         'first_interest_payment': first_interest_payment,
-        'first_principal_payment': first_principal_payment
+        'first_principal_payment': first_principal_payment,
+        'total_fees': total_fees
     }
 
+def calculate_amortization_schedule(loan_amounts, tan_annuals, loan_duration_years):
+    """Build the full monthly amortization schedule (French method) for a batch of loans.
+
+    Residual debt after k payments has the closed form P * ((1+r)^n - (1+r)^k) / ((1+r)^n - 1),
+    so every period of every loan is computed on a (loans x months) grid without looping.
+    Returns a long-format DataFrame with one row per loan and payment.
+    """
+    loan_amounts, tan_annuals, loan_duration_years = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(loan_amounts, dtype=float)),
+        np.atleast_1d(np.asarray(tan_annuals, dtype=float)),
+        np.atleast_1d(np.asarray(loan_duration_years))
+    )
+    total_payments = np.round(loan_duration_years * 12).astype(np.int64)
+    if np.any(loan_amounts <= 0) or np.any(total_payments <= 0):
+        raise ValueError("Importo e durata del prestito devono essere positivi!")
+    
+    monthly_rates = (tan_annuals / 100) / 12
+    periods = np.arange(total_payments.max() + 1)
+    
+    # Growth factors (1+r)^k for k = 0..n_max, with the zero-rate limit handled separately
+    log_growth = np.log1p(monthly_rates)[:, None]
+    growth = np.exp(log_growth * periods)
+    final_growth = np.exp(log_growth[:, 0] * total_payments)
+    is_zero_rate = monthly_rates == 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        remaining_share = np.where(
+            is_zero_rate[:, None],
+            1 - periods / total_payments[:, None],
+            (final_growth[:, None] - growth) / (final_growth - 1)[:, None]
+        )
+    monthly_payments = calculate_loan_payment_vectorized(loan_amounts, tan_annuals, total_payments / 12)
+    active = periods[None, 1:] <= total_payments[:, None]
+    residual_debt = np.where(periods <= total_payments[:, None], loan_amounts[:, None] * remaining_share, 0.0)
+    residual_debt[:, 1:][active] = np.maximum(residual_debt[:, 1:][active], 0.0)
+    
+    interest = monthly_rates[:, None] * residual_debt[:, :-1]
+    principal = residual_debt[:, :-1] - residual_debt[:, 1:]
+    loan_index = np.broadcast_to(np.arange(loan_amounts.size)[:, None], active.shape)
+    
+    return pd.DataFrame({
+        'loan': loan_index[active],
+        'period': np.broadcast_to(periods[1:], active.shape)[active],
+        'payment': (interest + principal)[active],
+        'interest': interest[active],
+        'principal': principal[active],
+        'residual_debt': residual_debt[:, 1:][active],
+        'monthly_payment': np.broadcast_to(monthly_payments[:, None], active.shape)[active]
+    })
+
+def parse_amount_list(text):
+    """Parse amounts separated by semicolons in Italian format, e.g. 150.000; 1.500,50"""
+    amounts = []
+    for value in text.split(";"):
+        value = value.strip().replace("€", "").replace(" ", "")
+        if not value:
+            continue
+        try:
+            amounts.append(float(value.replace(".", "").replace(",", ".")))
+        except ValueError:
+            raise ValueError(f"Importo non valido: {value}")
+    return amounts
+
+def calculate_loan_scenario_matrix(loan_amounts, tan_annuals, loan_duration_years):
+    """Evaluate the installment over every combination of amount, TAN and duration.
+
+    The three vectors are broadcast against each other on an (amounts x rates x durations)
+    grid, so thousands of scenarios take a single call. Returns a long-format DataFrame.
+    """
+    loan_amounts = np.atleast_1d(np.asarray(loan_amounts, dtype=float))
+    tan_annuals = np.atleast_1d(np.asarray(tan_annuals, dtype=float))
+    loan_duration_years = np.atleast_1d(np.asarray(loan_duration_years, dtype=float))
+    if loan_amounts.size == 0 or tan_annuals.size == 0 or loan_duration_years.size == 0:
+        raise ValueError("Inserire almeno un valore per importo, TAN e durata!")
+    if np.any(loan_amounts <= 0) or np.any(loan_duration_years <= 0):
+        raise ValueError("Importi e durate devono essere positivi!")
+    
+    amounts = loan_amounts[:, None, None]
+    rates = tan_annuals[None, :, None]
+    durations = loan_duration_years[None, None, :]
+    monthly_payments = calculate_loan_payment_vectorized(amounts, rates, durations)
+    total_interest = monthly_payments * durations * 12 - amounts
+    shape = monthly_payments.shape
+    
+    return pd.DataFrame({
+        'loan_amount': np.broadcast_to(amounts, shape).ravel(),
+        'tan_annual': np.broadcast_to(rates, shape).ravel(),
+        'loan_duration_years': np.broadcast_to(durations, shape).ravel(),
+        'monthly_payment': monthly_payments.ravel(),
+        'total_interest': total_interest.ravel()
+    })
+
+def count_remaining_payments(residual_debt, tan_annual, monthly_payment):
+    """Number of installments of a given amount needed to repay the residual debt"""
+    monthly_rate = (tan_annual / 100) / 12
+    if residual_debt <= 0:
+        return 0
+    if monthly_rate > 0:
+        payments = -math.log1p(-residual_debt * monthly_rate / monthly_payment) / math.log1p(monthly_rate)
+    else:
+        payments = residual_debt / monthly_payment
+    return math.ceil(payments - 1e-9)
+
+def iterate_loan_schedule(loan_amount, tan_annual, loan_duration_years, prepayments=None,
+                          payment_holidays=(), rate_changes=None, prepayment_mode="Riduci Rata"):
+    """Lazily yield the monthly schedule of a loan with prepayments, holidays and rate resets.
+
+    prepayments maps a period to an extra principal repayment made with that installment,
+    payment_holidays lists periods in which only interest is paid (the end date moves one
+    month later) and rate_changes maps a period to the new TAN applied from that period.
+    The installment is recomputed only when an event fires; after a prepayment it is either
+    reduced ("Riduci Rata") or kept while the loan ends earlier ("Riduci Durata").
+    """
+    prepayments = prepayments or {}
+    rate_changes = rate_changes or {}
+    payment_holidays = set(payment_holidays)
+    
+    residual_debt = float(loan_amount)
+    remaining_payments = int(round(loan_duration_years * 12))
+    monthly_payment = calculate_loan_payment(residual_debt, tan_annual, remaining_payments / 12)
+    period = 0
+    
+    while residual_debt > 1e-8 and remaining_payments > 0:
+        period += 1
+        if period in rate_changes:
+            tan_annual = rate_changes[period]
+            monthly_payment = calculate_loan_payment(residual_debt, tan_annual, remaining_payments / 12)
+        
+        interest = residual_debt * (tan_annual / 100) / 12
+        if period in payment_holidays:
+            principal = 0.0
+        else:
+            principal = min(monthly_payment - interest, residual_debt)
+            remaining_payments -= 1
+        
+        prepayment = min(prepayments.get(period, 0.0), residual_debt - principal)
+        residual_debt -= principal + prepayment
+        
+        if prepayment > 0 and remaining_payments > 0:
+            if prepayment_mode == "Riduci Rata":
+                monthly_payment = calculate_loan_payment(residual_debt, tan_annual, remaining_payments / 12)
+            else:  # Riduci Durata
+                remaining_payments = count_remaining_payments(residual_debt, tan_annual, monthly_payment)
+        
+        yield {
+            'period': period,
+            'payment': interest + principal,
+            'interest': interest,
+            'principal': principal,
+            'prepayment': prepayment,
+            'residual_debt': residual_debt,
+            'tan_annual': tan_annual
+        }
+
 def display_loan_results(results):
     """Display loan calculation results"""
     st.success("**Risultati Prestito:**")
@@ -107,7 +447,8 @@ def display_loan_results(results):
         st.write(f"• **Interessi Totali Pagati (TAN):** {format_currency(results['total_interest'])}")
         st.write(f"• **Percentuale Interessi:** {format_percentage(results['interest_percentage'])}")
         st.write(f"• **TAN Annuo di Riferimento:** {format_percentage(results['tan_annual'])}")
-        st.write(f"• **TAEG Annuo di Riferimento:** {format_percentage(results['taeg_annual'])}")
+        st.write(f"• **Costi Accessori Totali:** {format_currency(results['total_fees'])}")
+        st.write(f"• **TAEG Calcolato:** {format_percentage(results['taeg_annual'])}")
         
         # Cost analysis
         if results['interest_percentage'] > 50:
@@ -123,3 +464,85 @@ def display_loan_results(results):
             st.warning(f"⚠️ TAEG significativamente > TAN (+{format_percentage(taeg_tan_diff)})")
         else:
             st.info(f"ℹ️ Differenza TAEG-TAN: +{format_percentage(taeg_tan_diff)}")
+
+def display_amortization_schedule(schedule):
+    """Display the amortization schedule of a single loan with yearly totals and CSV export"""
+    st.write("**📅 Piano di Ammortamento:**")
+    
+    schedule = schedule.drop(columns=['loan', 'monthly_payment'])
+    yearly = schedule.groupby((schedule['period'] - 1) // 12 + 1).agg(
+        {'interest': 'sum', 'principal': 'sum', 'residual_debt': 'last'}
+    )
+    yearly.index.name = 'Anno'
+    
+    st.bar_chart(yearly[['principal', 'interest']].rename(
+        columns={'principal': 'Quota Capitale', 'interest': 'Quota Interessi'}
+    ))
+    
+    st.dataframe(schedule.rename(columns={
+        'period': 'Rata', 'payment': 'Importo Rata (€)', 'interest': 'Quota Interessi (€)',
+        'principal': 'Quota Capitale (€)', 'residual_debt': 'Debito Residuo (€)'
+    }).set_index('Rata').round(2))
+    
+    st.download_button(
+        "Scarica Piano di Ammortamento (CSV)",
+        schedule.to_csv(index=False),
+        file_name="piano_ammortamento.csv",
+        mime="text/csv",
+        key="download_loan_schedule"
+    )
+
+def display_loan_scenario_matrix(scenarios):
+    """Display the scenario matrix as one installment heatmap per amount and as a table"""
+    heatmap = alt.Chart(scenarios).mark_rect().encode(
+        x=alt.X('tan_annual:O', title="TAN (%)", axis=alt.Axis(format='.2f', labelOverlap=True)),
+        y=alt.Y('loan_duration_years:O', title="Durata (Anni)"),
+        color=alt.Color('monthly_payment:Q', title="Rata Mensile (€)", scale=alt.Scale(scheme='viridis')),
+        facet=alt.Facet('loan_amount:O', title="Importo (€)", columns=3),
+        tooltip=[
+            alt.Tooltip('loan_amount:Q', title="Importo (€)", format=',.0f'),
+            alt.Tooltip('tan_annual:Q', title="TAN (%)", format='.2f'),
+            alt.Tooltip('loan_duration_years:Q', title="Durata (Anni)"),
+            alt.Tooltip('monthly_payment:Q', title="Rata Mensile (€)", format=',.2f'),
+            alt.Tooltip('total_interest:Q', title="Interessi Totali (€)", format=',.2f')
+        ]
+    )
+    st.altair_chart(heatmap)
+    
+    table = scenarios.pivot_table(
+        index=['loan_amount', 'loan_duration_years'], columns='tan_annual', values='monthly_payment'
+    )
+    table.index.names = ['Importo (€)', 'Durata (Anni)']
+    table.columns = [f"TAN {value:.2f}%" for value in table.columns]
+    st.dataframe(table.round(2))
+
+def display_loan_event_schedule(schedule, base_payments, base_interest):
+    """Display a schedule with events compared with the original plan"""
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write(f"• **Numero Rate:** {len(schedule)} (piano originale: {base_payments})")
+        st.write(f"• **Interessi Totali:** {format_currency(schedule['interest'].sum())}")
+    
+    with col2:
+        st.write(f"• **Ultima Rata:** {format_currency(schedule['payment'].iloc[-1])}")
+        st.write(f"• **Interessi Risparmiati:** {format_currency(base_interest - schedule['interest'].sum())}")
+    
+    st.line_chart(schedule.set_index('period')['residual_debt'].rename("Debito Residuo (€)"))
+
+def display_variable_rate_simulation(simulation):
+    """Display installment and total interest percentiles of the variable-rate simulation"""
+    labels = [f"P{value}" for value in simulation['percentiles']]
+    
+    st.write(f"**📊 Risultati su {simulation['num_paths']:,} scenari:**".replace(",", "."))
+    bands = pd.DataFrame(simulation['yearly_installment_percentiles'].T, columns=labels)
+    bands.index = bands.index + 1
+    bands.index.name = 'Anno'
+    st.line_chart(bands)
+    
+    summary = pd.DataFrame({
+        'Interessi Totali (€)': simulation['total_interest_percentiles'],
+        'Rata Massima (€)': simulation['max_installment_percentiles']
+    }, index=labels)
+    st.dataframe(summary.round(2))
+    st.write(f"• **Interessi Totali Medi:** {format_currency(simulation['mean_total_interest'])}")
@@ -0,0 +1,112 @@
+import numpy as np
+from financial_utils import calculate_loan_payment_vectorized, run_simulation_chunks
+
+def simulate_vasicek_paths(initial_rate, long_term_rate, mean_reversion, volatility, num_months, num_paths, rng):
+    """Monthly Vasicek short-rate paths using the exact Ornstein-Uhlenbeck transition (rates in %)"""
+    dt = 1 / 12
+    decay = np.exp(-mean_reversion * dt)
+    if mean_reversion > 0:
+        step_volatility = volatility * np.sqrt((1 - decay ** 2) / (2 * mean_reversion))
+    else:
+        step_volatility = volatility * np.sqrt(dt)
+    
+    shocks = rng.standard_normal((num_paths, num_months))
+    paths = np.empty((num_paths, num_months))
+    rate = np.full(num_paths, float(initial_rate))
+    for month in range(num_months):
+        rate = long_term_rate + (rate - long_term_rate) * decay + step_volatility * shocks[:, month]
+        paths[:, month] = rate
+    return paths
+
+def simulate_cir_paths(initial_rate, long_term_rate, mean_reversion, volatility, num_months, num_paths, rng):
+    """Monthly CIR short-rate paths with a full-truncation Euler scheme (rates in %, never negative)"""
+    dt = 1 / 12
+    # Work in decimals so the square-root diffusion has the usual scale
+    long_term = long_term_rate / 100
+    shocks = rng.standard_normal((num_paths, num_months))
+    paths = np.empty((num_paths, num_months))
+    rate = np.full(num_paths, initial_rate / 100)
+    for month in range(num_months):
+        positive_rate = np.maximum(rate, 0)
+        rate = (rate + mean_reversion * (long_term - positive_rate) * dt
+                + volatility / 100 * np.sqrt(positive_rate * dt) * shocks[:, month])
+        paths[:, month] = np.maximum(rate, 0) * 100
+    return paths
+
+SHORT_RATE_MODELS = {
+    "Vasicek": simulate_vasicek_paths,
+    "CIR": simulate_cir_paths
+}
+
+def simulate_mortgage_chunk(num_paths, seed_sequence, loan_amount, spread, num_months, model, initial_rate,
+                            long_term_rate, mean_reversion, volatility, reset_months, index_floor):
+    """Simulate one chunk of variable-rate mortgage paths.
+
+    The installment is recomputed at every reset on the residual debt and remaining term,
+    vectorized across the paths of the chunk. Returns yearly average installments and the
+    total interest and highest installment of every path.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    index_paths = SHORT_RATE_MODELS[model](
+        initial_rate, long_term_rate, mean_reversion, volatility, num_months, num_paths, rng
+    )
+    if index_floor is not None:
+        index_paths = np.maximum(index_paths, index_floor)
+    
+    residual_debt = np.full(num_paths, float(loan_amount))
+    installments = np.empty((num_paths, num_months))
+    total_interest = np.zeros(num_paths)
+    for month in range(num_months):
+        tan_annual = index_paths[:, month - month % reset_months] + spread
+        if month % reset_months == 0:
+            payment = calculate_loan_payment_vectorized(residual_debt, tan_annual, (num_months - month) / 12)
+        interest = residual_debt * (tan_annual / 100) / 12
+        residual_debt = residual_debt - (payment - interest)
+        installments[:, month] = payment
+        total_interest += interest
+    
+    years = -(-num_months // 12)
+    padded = np.full((num_paths, years * 12), np.nan)
+    padded[:, :num_months] = installments
+    
+    return {
+        'yearly_installments': np.nanmean(padded.reshape(num_paths, years, 12), axis=2),
+        'total_interest': total_interest,
+        'max_installment': installments.max(axis=1)
+    }
+
+def simulate_variable_rate_mortgage(loan_amount, spread, loan_duration_years, initial_rate, long_term_rate,
+                                    mean_reversion, volatility, model="Vasicek", num_paths=10000,
+                                    reset_months=1, index_floor=0.0, percentiles=(5, 25, 50, 75, 95),
+                                    chunk_size=5000, seed=None, max_workers=None):
+    """Monte Carlo simulation of a variable-rate mortgage indexed to Euribor plus a spread.
+
+    Index paths come from the chosen short-rate model (SHORT_RATE_MODELS); rates, spread and
+    volatility are in percent. Paths are simulated in chunks spread over a process pool, so
+    memory is bounded by chunk_size. Returns percentiles of the yearly average installment,
+    of the total interest and of the highest installment.
+    """
+    if model not in SHORT_RATE_MODELS:
+        raise ValueError(f"Modello di tasso non supportato: {model}")
+    num_months = int(round(loan_duration_years * 12))
+    if loan_amount <= 0 or num_months <= 0 or num_paths <= 0:
+        raise ValueError("Importo, durata e numero di simulazioni devono essere positivi!")
+    
+    chunks = run_simulation_chunks(
+        simulate_mortgage_chunk, num_paths, chunk_size, seed=seed, max_workers=max_workers,
+        loan_amount=loan_amount, spread=spread, num_months=num_months, model=model,
+        initial_rate=initial_rate, long_term_rate=long_term_rate, mean_reversion=mean_reversion,
+        volatility=volatility, reset_months=max(int(reset_months), 1), index_floor=index_floor
+    )
+    yearly_installments = np.concatenate([chunk['yearly_installments'] for chunk in chunks])
+    total_interest = np.concatenate([chunk['total_interest'] for chunk in chunks])
+    max_installment = np.concatenate([chunk['max_installment'] for chunk in chunks])
+    
+    return {
+        'percentiles': np.asarray(percentiles),
+        'yearly_installment_percentiles': np.percentile(yearly_installments, percentiles, axis=0),
+        'total_interest_percentiles': np.percentile(total_interest, percentiles),
+        'max_installment_percentiles': np.percentile(max_installment, percentiles),
+        'mean_total_interest': total_interest.mean(),
+        'num_paths': total_interest.size
+    }
@@ -1,6 +1,44 @@
 import streamlit as st
+import numpy as np
+import pandas as pd
+import altair as alt
+from financial_utils import calculate_real_estate_investment_improved
+from real_estate_simulation import simulate_real_estate_investment
 from ui_components import format_currency, format_percentage
 
+# Inputs swept by the sensitivity analysis: label, kind of step and step size. 'money' inputs
+# move by a percentage of their value (by the step size when they are zero), 'percent' inputs
+# by percentage points and 'years' inputs by whole years. The categorical tipo_adeguamento is
+# left out on purpose: its three modes are not points on a range.
+SENSITIVITY_PARAMETERS = {
+    'valore_immobile': ("Valore Immobile", 'money', 10000.0),
+    'affitto_lordo': ("Affitto Lordo", 'money', 1000.0),
+    'rivalutazione_annua': ("Rivalutazione Annua", 'percent', 0.5),
+    'anni_investimento': ("Anni Investimento", 'years', 1),
+    'costi_assicurazione_perc': ("Costi Assicurazione", 'percent', 0.05),
+    'costi_gestione_euro': ("Costi Gestione", 'money', 200.0),
+    'rata_mutuo_mensile': ("Rata Mutuo", 'money', 100.0),
+    'anni_restanti_mutuo': ("Anni Restanti Mutuo", 'years', 1),
+    'manutenzione_straordinaria_perc': ("Manutenzione Straordinaria", 'percent', 0.1),
+    'tassazione_affitti_perc': ("Tassazione Affitti", 'percent', 2.0),
+    'tassa_catastale_perc': ("Tassa Catastale", 'percent', 0.1),
+    'periodo_sfitto_perc': ("Periodo Sfitto", 'percent', 1.0),
+    'inflazione_perc': ("Inflazione", 'percent', 0.5),
+    'adeguamento_affitto_anni': ("Adeguamento Affitto (Anni)", 'years', 1)
+}
+# Range allowed for the swept values (inputs not listed stay non-negative)
+SENSITIVITY_BOUNDS = {
+    'rivalutazione_annua': (-99, None),
+    'inflazione_perc': (-99, None),
+    'tassazione_affitti_perc': (0, 100),
+    'periodo_sfitto_perc': (0, 100),
+    'anni_investimento': (1, None),
+    'adeguamento_affitto_anni': (1, None)
+}
+# A mortgage needs both an installment and a remaining term: when the other one is zero, the
+# swept input is paired with a mortgage over the whole horizon or with the installment step
+MORTGAGE_PARAMETERS = ('rata_mutuo_mensile', 'anni_restanti_mutuo')
+
 def render_real_estate_section():
     """Render real estate investment calculator section"""
     with st.expander("🏘️ Calcolo Investimento Immobiliare", expanded=False):
@@ -186,188 +224,262 @@ def render_real_estate_section():
             st.write("• **Mutuo**: Se presente, viene considerato fino alla scadenza")
             st.write("• Rate mutuo sono fisse e non si adeguano all'inflazione")
         
+        params = {
+            'valore_immobile': valore_immobile,
+            'affitto_lordo': affitto_lordo,
+            'rivalutazione_annua': rivalutazione_annua,
+            'anni_investimento': anni_investimento,
+            'costi_assicurazione_perc': costi_assicurazione_perc,
+            'costi_gestione_euro': costi_gestione_euro,
+            'rata_mutuo_mensile': rata_mutuo_mensile,
+            'anni_restanti_mutuo': anni_restanti_mutuo,
+            'manutenzione_straordinaria_perc': manutenzione_straordinaria_perc,
+            'tassazione_affitti_perc': tassazione_affitti_perc,
+            'tassa_catastale_perc': tassa_catastale_perc,
+            'periodo_sfitto_perc': periodo_sfitto_perc,
+            'inflazione_perc': inflazione_perc,
+            'adeguamento_affitto_anni': adeguamento_affitto_anni,
+            'tipo_adeguamento': tipo_adeguamento
+        }
+        
         if st.button("🏠 Calcola Investimento Immobiliare", key="calc_real_estate"):
             try:
-                params = {
-                    'valore_immobile': valore_immobile,
-                    'affitto_lordo': affitto_lordo,
-                    'rivalutazione_annua': rivalutazione_annua,
-                    'anni_investimento': anni_investimento,
-                    'costi_assicurazione_perc': costi_assicurazione_perc,
-                    'costi_gestione_euro': costi_gestione_euro,
-                    'rata_mutuo_mensile': rata_mutuo_mensile,
-                    'anni_restanti_mutuo': anni_restanti_mutuo,
-                    'manutenzione_straordinaria_perc': manutenzione_straordinaria_perc,
-                    'tassazione_affitti_perc': tassazione_affitti_perc,
-                    'tassa_catastale_perc': tassa_catastale_perc,
-                    'periodo_sfitto_perc': periodo_sfitto_perc,
-                    'inflazione_perc': inflazione_perc,
-                    'adeguamento_affitto_anni': adeguamento_affitto_anni,
-                    'tipo_adeguamento': tipo_adeguamento
-                }
                 results = calculate_real_estate_investment_improved(params)
                 display_real_estate_results_simplified(results, params)
             except Exception as e:
                 st.error(f"❌ Errore nel calcolo immobiliare: {str(e)}")
                 st.error("Verifica che tutti i valori siano corretti.")
                 st.exception(e)
+        
+        st.write("**🌪️ Analisi di Sensibilità**")
+        st.caption("Ogni parametro viene variato da solo su un intervallo di valori attorno al caso base; "
+                   "la modalità di adeguamento dell'affitto è esclusa perché non è un valore numerico")
+        sensitivity_col1, sensitivity_col2 = st.columns(2)
+        
+        with sensitivity_col1:
+            variation_perc = st.slider(
+                "Passo Importi (% del valore)", min_value=1, max_value=50, value=10, step=1,
+                key="real_estate_sensitivity_variation",
+                help="Passo per valore, affitto, costi di gestione e rata; le percentuali variano "
+                     "di punti fissi e gli anni di un anno per passo"
+            )
+        
+        with sensitivity_col2:
+            num_steps = st.slider(
+                "Passi per Lato", min_value=1, max_value=10, value=4, step=1,
+                key="real_estate_sensitivity_steps",
+                help="Numero di valori valutati sotto e sopra il caso base per ogni parametro"
+            )
+        
+        if st.button("Calcola Analisi di Sensibilità", key="calc_real_estate_sensitivity"):
+            try:
+                sensitivity = calculate_real_estate_sensitivity(params, variation_perc, num_steps)
+                display_real_estate_sensitivity(sensitivity)
+            except Exception as e:
+                st.error(f"Errore nell'analisi di sensibilità: {str(e)}")
+        
+        st.write("**🎲 Simulazione Monte Carlo (Rivalutazione, Sfitto e Inflazione Correlati)**")
+        st.caption("I valori inseriti sopra sono usati come medie annue; ogni anno i tre fattori vengono estratti con le volatilità e correlazioni indicate")
+        mc_col1, mc_col2, mc_col3 = st.columns(3)
+        
+        with mc_col1:
+            volatilita_rivalutazione = st.number_input(
+                "Volatilità Rivalutazione (punti %)", min_value=0.0, max_value=50.0, value=3.0, step=0.5,
+                key="real_estate_mc_vol_appreciation"
+            )
+            volatilita_sfitto = st.number_input(
+                "Volatilità Sfitto (punti %)", min_value=0.0, max_value=50.0, value=3.0, step=0.5,
+                key="real_estate_mc_vol_vacancy"
+            )
+            volatilita_inflazione = st.number_input(
+                "Volatilità Inflazione (punti %)", min_value=0.0, max_value=20.0, value=1.0, step=0.25,
+                key="real_estate_mc_vol_inflation"
+            )
+        
+        with mc_col2:
+            correlazione_rivalutazione_sfitto = st.slider(
+                "Correlazione Rivalutazione/Sfitto", min_value=-1.0, max_value=1.0, value=-0.3, step=0.05,
+                key="real_estate_mc_corr_appreciation_vacancy"
+            )
+            correlazione_rivalutazione_inflazione = st.slider(
+                "Correlazione Rivalutazione/Inflazione", min_value=-1.0, max_value=1.0, value=0.5, step=0.05,
+                key="real_estate_mc_corr_appreciation_inflation"
+            )
+            correlazione_sfitto_inflazione = st.slider(
+                "Correlazione Sfitto/Inflazione", min_value=-1.0, max_value=1.0, value=0.0, step=0.05,
+                key="real_estate_mc_corr_vacancy_inflation"
+            )
+        
+        with mc_col3:
+            num_simulazioni = st.select_slider(
+                "Numero di Simulazioni", options=[10000, 50000, 100000, 250000, 500000],
+                value=100000, key="real_estate_mc_paths"
+            )
+            seme_simulazione = st.number_input(
+                "Seme Casuale", min_value=0, value=42, step=1, key="real_estate_mc_seed",
+                help="Lo stesso seme riproduce esattamente gli stessi risultati"
+            )
+        
+        if st.button("🎲 Simula Investimento Immobiliare", key="calc_real_estate_mc"):
+            try:
+                correlazioni = [
+                    [1.0, correlazione_rivalutazione_sfitto, correlazione_rivalutazione_inflazione],
+                    [correlazione_rivalutazione_sfitto, 1.0, correlazione_sfitto_inflazione],
+                    [correlazione_rivalutazione_inflazione, correlazione_sfitto_inflazione, 1.0]
+                ]
+                with st.spinner("Simulazione in corso..."):
+                    simulation = simulate_real_estate_investment(
+                        params, [volatilita_rivalutazione, volatilita_sfitto, volatilita_inflazione],
+                        correlazioni, num_simulazioni, seed=seme_simulazione
+                    )
+                display_real_estate_simulation(simulation)
+            except Exception as e:
+                st.error(f"Errore nella simulazione: {str(e)}")
 
-def calculate_real_estate_investment_improved(params):
-    """Calculate real estate investment returns with flexible rent adjustment methods, mortgage costs and inflation-adjusted management costs"""
-    
-    # Convert percentages to decimals
-    rivalutazione_decimal = params['rivalutazione_annua'] / 100
-    inflazione_decimal = params['inflazione_perc'] / 100
-    periodo_sfitto_decimal = params['periodo_sfitto_perc'] / 100
-    manutenzione_decimal = params['manutenzione_straordinaria_perc'] / 100
-    tassazione_decimal = params['tassazione_affitti_perc'] / 100
-    
-    # Convert cost percentages to decimals
-    costi_assicurazione_decimal = params['costi_assicurazione_perc'] / 100
-    tassa_catastale_decimal = params['tassa_catastale_perc'] / 100
-    
-    # Initialize variables for year-by-year calculation
-    valore_corrente = params['valore_immobile']
-    affitto_corrente = params['affitto_lordo']
-    costi_gestione_correnti = params['costi_gestione_euro']  # Costi fissi iniziali
-    
-    # Calculate initial rent-to-value ratio for property value adjustments
-    rapporto_affitto_iniziale = params['affitto_lordo'] / params['valore_immobile']
-    
-    # Mortgage parameters
-    rata_mutuo_annua = params['rata_mutuo_mensile'] * 12 if params['rata_mutuo_mensile'] > 0 else 0
+def calculate_real_estate_sensitivity(params, variation_perc=10.0, num_steps=4):
+    """One-at-a-time sensitivity of the real CAGR and of the total real return.
+
+    Every input in SENSITIVITY_PARAMETERS is swept over num_steps steps below and above its
+    base value while the others stay at the base case, with steps as described there and
+    values kept within SENSITIVITY_BOUNDS. The base case and all variants are evaluated in
+    one batched call. Returns the base metrics, every evaluated point and a per-parameter
+    summary of the changes at the lowest and highest swept value, sorted by the widest
+    CAGR swing.
+    """
+    keys = list(SENSITIVITY_PARAMETERS)
+    offsets = np.concatenate([np.arange(-num_steps, 0), np.arange(1, num_steps + 1)])
+    num_variants = len(keys) * offsets.size + 1
     
-    # Lists to store annual data
-    valori_annuali = []
-    affitti_lordi_annuali = []
-    affitti_netti_annuali = []
-    rendimenti_annuali = []
-    costi_gestione_annuali = []
-    costi_mutuo_annuali = []
+    batch = {key: np.full(num_variants, float(params[key])) for key in keys}
+    batch['tipo_adeguamento'] = params['tipo_adeguamento']
+    for index, key in enumerate(keys):
+        _, kind, step = SENSITIVITY_PARAMETERS[key]
+        if kind == 'money' and params[key] != 0:
+            step = abs(params[key]) * variation_perc / 100
+        lower, upper = SENSITIVITY_BOUNDS.get(key, (0, None))
+        variants = slice(index * offsets.size + 1, (index + 1) * offsets.size + 1)
+        batch[key][variants] = np.clip(params[key] + offsets * step, lower, upper)
+        if key in MORTGAGE_PARAMETERS:
+            other = MORTGAGE_PARAMETERS[1 - MORTGAGE_PARAMETERS.index(key)]
+            if params[other] == 0:
+                batch[other][variants] = (params['anni_investimento'] if other == 'anni_restanti_mutuo'
+                                          else SENSITIVITY_PARAMETERS[other][2])
     
-    # Calculate year by year
-    for anno in range(1, params['anni_investimento'] + 1):
-        # Update property value with appreciation
-        valore_corrente = valore_corrente * (1 + rivalutazione_decimal)
-        
-        # Update management costs with inflation
-        costi_gestione_correnti = costi_gestione_correnti * (1 + inflazione_decimal)
-        
-        # Determine if rent adjustment should occur
-        adeguamento_questo_anno = (anno % params['adeguamento_affitto_anni'] == 0)
-        
-        # Adjust rent based on selected method
-        if adeguamento_questo_anno:
-            if params['tipo_adeguamento'] == "Valore Immobile":
-                # Adjust rent to maintain same percentage of property value
-                affitto_corrente = valore_corrente * rapporto_affitto_iniziale
-                
-            elif params['tipo_adeguamento'] == "Inflazione":
-                # Adjust rent by cumulative inflation for the adjustment period
-                inflazione_cumulativa = (1 + inflazione_decimal) ** params['adeguamento_affitto_anni']
-                affitto_corrente = affitto_corrente * inflazione_cumulativa
-                
-            # If "Nessun Adeguamento", rent stays the same
-        
-        # Calculate mortgage cost for this year
-        costo_mutuo_anno = 0
-        if rata_mutuo_annua > 0 and anno <= params['anni_restanti_mutuo']:
-            costo_mutuo_anno = rata_mutuo_annua
-        
-        # Calculate costs as percentages of current property value (updated annually)
-        costi_assicurazione_correnti = valore_corrente * costi_assicurazione_decimal
-        tassa_catastale_corrente = valore_corrente * tassa_catastale_decimal
-        
-        # Calculate effective rent considering vacancy
-        affitto_effettivo = affitto_corrente * (1 - periodo_sfitto_decimal)
-        
-        # Calculate taxes on rent
-        tasse_affitto = affitto_effettivo * tassazione_decimal
-        
-        # Calculate annual costs (management costs adjusted for inflation, others based on current property value)
-        manutenzione_annua = valore_corrente * manutenzione_decimal
-        costi_totali_annui = (costi_assicurazione_correnti + costi_gestione_correnti + 
-                            manutenzione_annua + tassa_catastale_corrente + 
-                            tasse_affitto + costo_mutuo_anno)
-        
-        # Calculate net annual rent
-        affitto_netto = affitto_effettivo - costi_totali_annui
-        
-        # Calculate annual yield on original property value
-        rendimento_annuo = (affitto_netto / params['valore_immobile']) * 100 if params['valore_immobile'] > 0 else 0
-        
-        # Store data
-        valori_annuali.append(valore_corrente)
-        affitti_lordi_annuali.append(affitto_corrente)
-        affitti_netti_annuali.append(affitto_netto)
-        rendimenti_annuali.append(rendimento_annuo)
-        costi_gestione_annuali.append(costi_gestione_correnti)
-        costi_mutuo_annuali.append(costo_mutuo_anno)
+    results = calculate_real_estate_investment_improved(batch)
+    cagr_reale = results['cagr_reale'] * 100
+    rendimento_totale_reale = results['rendimento_totale_reale']
     
-    # Final calculations
-    valore_finale_nominale = valori_annuali[-1]
-    valore_finale_reale = valore_finale_nominale / ((1 + inflazione_decimal) ** params['anni_investimento'])
+    points = pd.DataFrame({
+        'parameter': np.repeat([SENSITIVITY_PARAMETERS[key][0] for key in keys], offsets.size),
+        'offset': np.tile(offsets, len(keys)),
+        'value': np.concatenate([batch[key][index * offsets.size + 1:(index + 1) * offsets.size + 1]
+                                 for index, key in enumerate(keys)]),
+        'cagr_change': cagr_reale[1:] - cagr_reale[0],
+        'total_change': rendimento_totale_reale[1:] - rendimento_totale_reale[0]
+    })
+    lowest = points.groupby('parameter', sort=False).first()
+    highest = points.groupby('parameter', sort=False).last()
+    sensitivity = pd.DataFrame({
+        'parameter': lowest.index,
+        'base_value': [float(params[key]) for key in keys],
+        'low_value': lowest['value'].to_numpy(),
+        'high_value': highest['value'].to_numpy(),
+        'cagr_low': lowest['cagr_change'].to_numpy(),
+        'cagr_high': highest['cagr_change'].to_numpy(),
+        'total_low': lowest['total_change'].to_numpy(),
+        'total_high': highest['total_change'].to_numpy(),
+        'cagr_swing': (points.groupby('parameter', sort=False)['cagr_change'].max()
+                       - points.groupby('parameter', sort=False)['cagr_change'].min()).to_numpy()
+    })
     
-    # Total net rent received over the period
-    totale_affitti_netti = sum(affitti_netti_annuali)
-    totale_costi_mutuo = sum(costi_mutuo_annuali)
+    return {
+        'base_cagr_reale': cagr_reale[0],
+        'base_rendimento_totale_reale': rendimento_totale_reale[0],
+        'points': points,
+        'sensitivity': sensitivity.sort_values('cagr_swing', ascending=False, kind='stable').reset_index(drop=True)
+    }
+
+def display_real_estate_sensitivity(sensitivity):
+    """Display tornado charts, response curves and a summary table of the sensitivity analysis"""
+    table = sensitivity['sensitivity']
+    order = list(table['parameter'])
+    bars = pd.concat([
+        table[['parameter', 'low_value', 'cagr_low', 'total_low']].set_axis(
+            ['Parametro', 'Valore', 'CAGR', 'Rendimento'], axis=1).assign(Variazione="Valore Minimo"),
+        table[['parameter', 'high_value', 'cagr_high', 'total_high']].set_axis(
+            ['Parametro', 'Valore', 'CAGR', 'Rendimento'], axis=1).assign(Variazione="Valore Massimo")
+    ])
     
-    # Average annual net yield
-    rendimento_medio_annuo = sum(rendimenti_annuali) / len(rendimenti_annuali) if rendimenti_annuali else 0
+    st.write(f"• **CAGR Reale Base:** {format_percentage(sensitivity['base_cagr_reale'])}")
+    st.write(f"• **Rendimento Totale Reale Base:** {format_currency(sensitivity['base_rendimento_totale_reale'])}")
     
-    # Total return calculation - CORRECTED for inflation on rents
-    guadagno_capitale_nominale = valore_finale_nominale - params['valore_immobile']
-    guadagno_capitale_reale = valore_finale_reale - params['valore_immobile']
+    col1, col2 = st.columns(2)
+    for column, field, title, number_format in (
+        (col1, 'CAGR', "Variazione CAGR Reale (punti %)", '.2f'),
+        (col2, 'Rendimento', "Variazione Rendimento Totale Reale (€)", ',.0f')
+    ):
+        tornado = alt.Chart(bars).mark_bar().encode(
+            x=alt.X(f'{field}:Q', title=title),
+            y=alt.Y('Parametro:N', sort=order, title=None),
+            color=alt.Color('Variazione:N', title="Variazione",
+                            scale=alt.Scale(domain=["Valore Minimo", "Valore Massimo"], range=['#d62728', '#2ca02c'])),
+            tooltip=[
+                alt.Tooltip('Parametro:N'),
+                alt.Tooltip('Variazione:N'),
+                alt.Tooltip('Valore:Q', format=',.2f'),
+                alt.Tooltip(f'{field}:Q', title=title, format=number_format)
+            ]
+        )
+        with column:
+            st.altair_chart(tornado)
     
-    # Calculate real value of total net rents (adjust each year's rent to present value)
-    totale_affitti_netti_reale = 0
-    for anno, affitto_netto_anno in enumerate(affitti_netti_annuali, 1):
-        # Discount each year's rent back to present value using inflation
-        valore_presente_affitto = affitto_netto_anno / ((1 + inflazione_decimal) ** anno)
-        totale_affitti_netti_reale += valore_presente_affitto
+    st.write("**📈 Variazione del CAGR Reale per Passo:**")
+    curves = alt.Chart(sensitivity['points']).mark_line(point=True).encode(
+        x=alt.X('offset:Q', title="Passi dal Caso Base"),
+        y=alt.Y('cagr_change:Q', title="Variazione CAGR Reale (punti %)"),
+        color=alt.Color('parameter:N', title="Parametro", sort=order),
+        tooltip=[
+            alt.Tooltip('parameter:N', title="Parametro"),
+            alt.Tooltip('value:Q', title="Valore", format=',.2f'),
+            alt.Tooltip('cagr_change:Q', title="Variazione CAGR Reale (punti %)", format='.2f'),
+            alt.Tooltip('total_change:Q', title="Variazione Rendimento Totale Reale (€)", format=',.0f')
+        ]
+    )
+    st.altair_chart(curves)
     
-    rendimento_totale_nominale = totale_affitti_netti + guadagno_capitale_nominale
-    rendimento_totale_reale = totale_affitti_netti_reale + guadagno_capitale_reale
+    st.dataframe(table.rename(columns={
+        'parameter': 'Parametro', 'base_value': 'Valore Base', 'low_value': 'Valore Minimo',
+        'high_value': 'Valore Massimo', 'cagr_low': 'Δ CAGR Reale al Minimo (pp)',
+        'cagr_high': 'Δ CAGR Reale al Massimo (pp)', 'total_low': 'Δ Rendimento Reale al Minimo (€)',
+        'total_high': 'Δ Rendimento Reale al Massimo (€)', 'cagr_swing': 'Escursione CAGR Reale (pp)'
+    }).set_index('Parametro').round(2))
+
+def display_real_estate_simulation(simulation):
+    """Display CAGR and net rent percentiles and the yearly net rent bands of the simulation"""
+    labels = [f"P{value}" for value in simulation['percentiles']]
     
-    # CAGR calculation - CORRECTED for real values
-    cagr_nominale = ((valore_finale_nominale + totale_affitti_netti) / params['valore_immobile']) ** (1/params['anni_investimento']) - 1 if params['valore_immobile'] > 0 else 0
-    cagr_reale = ((valore_finale_reale + totale_affitti_netti_reale) / params['valore_immobile']) ** (1/params['anni_investimento']) - 1 if params['valore_immobile'] > 0 else 0
+    col1, col2 = st.columns(2)
     
-    # Calculate rent growth analysis
-    affitto_iniziale = params['affitto_lordo']
-    affitto_finale = affitti_lordi_annuali[-1]
-    crescita_affitto_totale = ((affitto_finale / affitto_iniziale) - 1) * 100 if affitto_iniziale > 0 else 0
-    crescita_affitto_annua = ((affitto_finale / affitto_iniziale) ** (1/params['anni_investimento']) - 1) * 100 if affitto_iniziale > 0 and params['anni_investimento'] > 0 else 0
+    with col1:
+        st.write(f"**📊 CAGR su {simulation['num_paths']:,} simulazioni:**".replace(",", "."))
+        st.dataframe(pd.DataFrame({
+            'CAGR Nominale (%)': simulation['cagr_nominale_percentiles'],
+            'CAGR Reale (%)': simulation['cagr_reale_percentiles']
+        }, index=labels).round(2))
+        st.write(f"• Probabilità di CAGR Reale Negativo: "
+                 f"**{format_percentage(simulation['negative_real_cagr_probability'] * 100)}**")
     
-    # Calculate management costs growth
-    costi_gestione_finali = costi_gestione_annuali[-1]
-    crescita_costi_gestione = ((costi_gestione_finali / params['costi_gestione_euro']) - 1) * 100 if params['costi_gestione_euro'] > 0 else 0
+    with col2:
+        st.write("**💰 Totale Affitti Netti:**")
+        st.dataframe(pd.DataFrame({
+            'Nominale (€)': simulation['totale_affitti_netti_percentiles'],
+            'Reale (€)': simulation['totale_affitti_netti_reale_percentiles']
+        }, index=labels).round(2))
     
-    return {
-        'valori_annuali': valori_annuali,
-        'affitti_lordi_annuali': affitti_lordi_annuali,
-        'affitti_netti_annuali': affitti_netti_annuali,
-        'rendimenti_annuali': rendimenti_annuali,
-        'costi_gestione_annuali': costi_gestione_annuali,
-        'costi_mutuo_annuali': costi_mutuo_annuali,
-        'valore_finale_nominale': valore_finale_nominale,
-        'valore_finale_reale': valore_finale_reale,
-        'totale_affitti_netti': totale_affitti_netti,
-        'totale_affitti_netti_reale': totale_affitti_netti_reale,
-        'totale_costi_mutuo': totale_costi_mutuo,
-        'rendimento_medio_annuo': rendimento_medio_annuo,
-        'guadagno_capitale_nominale': guadagno_capitale_nominale,
-        'guadagno_capitale_reale': guadagno_capitale_reale,
-        'rendimento_totale_nominale': rendimento_totale_nominale,
-        'rendimento_totale_reale': rendimento_totale_reale,
-        'cagr_nominale': cagr_nominale,
-        'cagr_reale': cagr_reale,
-        'affitto_finale': affitto_finale,
-        'crescita_affitto_totale': crescita_affitto_totale,
-        'crescita_affitto_annua': crescita_affitto_annua,
-        'costi_gestione_finali': costi_gestione_finali,
-        'crescita_costi_gestione': crescita_costi_gestione
-    }
+    st.write("**📈 Affitto Netto Annuo (percentili):**")
+    bands = pd.DataFrame(simulation['yearly_net_rent_percentiles'].T, columns=labels,
+                         index=pd.RangeIndex(1, simulation['yearly_net_rent_percentiles'].shape[1] + 1, name='Anni'))
+    st.line_chart(bands)
 
 def display_real_estate_results_simplified(results, params):
     """Display real estate investment calculation results - SIMPLIFIED VERSION"""
@@ -0,0 +1,89 @@
+import numpy as np
+from financial_utils import calculate_real_estate_investment_improved, run_simulation_chunks, split_into_chunks
+
+# Upper bound on the number of (path, year) cells held in memory by one chunk; the cash-flow
+# model keeps a few dozen arrays of this size alive at once
+SIMULATION_CHUNK_ELEMENTS = 250_000
+# Number of paths whose yearly net rent is kept to estimate the percentile bands over time
+BAND_SAMPLE_PATHS = 20000
+# Yearly drivers drawn by the simulation, in the order of the covariance matrix
+REAL_ESTATE_DRIVERS = ('rivalutazione_annua', 'periodo_sfitto_perc', 'inflazione_perc')
+
+def build_driver_cholesky(volatilities, correlations):
+    """Cholesky factor of the driver covariance diag(volatilities) R diag(volatilities).
+
+    volatilities are the yearly standard deviations (in percentage points) of the drivers in
+    REAL_ESTATE_DRIVERS and correlations their 3x3 correlation matrix R. The factorisation
+    is done on R, so drivers with zero volatility are allowed.
+    """
+    correlations = np.asarray(correlations, dtype=float)
+    if not np.allclose(correlations, correlations.T) or not np.allclose(np.diag(correlations), 1):
+        raise ValueError("La matrice di correlazione deve essere simmetrica con diagonale unitaria!")
+    try:
+        correlation_factor = np.linalg.cholesky(correlations)
+    except np.linalg.LinAlgError:
+        raise ValueError("La matrice di correlazione deve essere definita positiva!")
+    return np.asarray(volatilities, dtype=float)[:, None] * correlation_factor
+
+def simulate_real_estate_chunk(num_paths, seed_sequence, params, num_years, cholesky_factor, band_paths):
+    """Simulate one chunk of real estate investments with correlated yearly drivers.
+
+    Yearly appreciation, vacancy and inflation are normal around their values in params with
+    covariance cholesky_factor @ cholesky_factor.T, independent across years. Appreciation and
+    inflation are floored at -99% and vacancy kept within 0-100%. The whole chunk goes through
+    the cash-flow model as one batch of per-year paths. Returns the CAGR and net rent totals
+    of every path and the yearly net rent of the first band_paths paths.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    means = np.array([params[driver] for driver in REAL_ESTATE_DRIVERS], dtype=float)
+    drivers = means + rng.standard_normal((num_paths, num_years, len(means))) @ cholesky_factor.T
+    
+    batch = dict(params)
+    batch['rivalutazione_annua'] = np.maximum(drivers[..., 0], -99)
+    batch['periodo_sfitto_perc'] = np.clip(drivers[..., 1], 0, 100)
+    batch['inflazione_perc'] = np.maximum(drivers[..., 2], -99)
+    results = calculate_real_estate_investment_improved(batch)
+    
+    return {
+        'cagr_nominale': results['cagr_nominale'] * 100,
+        'cagr_reale': results['cagr_reale'] * 100,
+        'totale_affitti_netti': results['totale_affitti_netti'],
+        'totale_affitti_netti_reale': results['totale_affitti_netti_reale'],
+        'affitti_netti_annuali': results['affitti_netti_annuali'][:band_paths]
+    }
+
+def simulate_real_estate_investment(params, volatilities, correlations, num_paths=100000,
+                                    percentiles=(5, 25, 50, 75, 95), seed=None, max_workers=None):
+    """Monte Carlo distribution of a real estate investment with stochastic yearly drivers.
+
+    params is the single-property dict of calculate_real_estate_investment_improved; its
+    appreciation, vacancy and inflation are the means of the drawn paths (see
+    build_driver_cholesky for volatilities and correlations). Paths are simulated in chunks
+    of bounded size with a seeded Generator per chunk, spread over a process pool, so memory
+    does not grow with num_paths. CAGRs are in %; paths whose CAGR is undefined (total
+    value below zero) are left out of its percentiles.
+    """
+    num_years = int(params['anni_investimento'])
+    if num_years <= 0 or num_paths <= 0:
+        raise ValueError("Durata e numero di simulazioni devono essere positivi!")
+    cholesky_factor = build_driver_cholesky(volatilities, correlations)
+    
+    chunk_size = max(SIMULATION_CHUNK_ELEMENTS // num_years, 1)
+    num_chunks = len(split_into_chunks(num_paths, chunk_size))
+    chunks = run_simulation_chunks(
+        simulate_real_estate_chunk, num_paths, chunk_size, seed=seed, max_workers=max_workers,
+        params=params, num_years=num_years, cholesky_factor=cholesky_factor,
+        band_paths=-(-BAND_SAMPLE_PATHS // num_chunks)
+    )
+    outcomes = {key: np.concatenate([chunk[key] for chunk in chunks]) for key in chunks[0]}
+    
+    return {
+        'percentiles': np.asarray(percentiles),
+        'cagr_nominale_percentiles': np.nanpercentile(outcomes['cagr_nominale'], percentiles),
+        'cagr_reale_percentiles': np.nanpercentile(outcomes['cagr_reale'], percentiles),
+        'totale_affitti_netti_percentiles': np.percentile(outcomes['totale_affitti_netti'], percentiles),
+        'totale_affitti_netti_reale_percentiles': np.percentile(outcomes['totale_affitti_netti_reale'], percentiles),
+        'yearly_net_rent_percentiles': np.percentile(outcomes['affitti_netti_annuali'], percentiles, axis=0),
+        'negative_real_cagr_probability': np.mean(~(outcomes['cagr_reale'] >= 0)),
+        'num_paths': outcomes['cagr_reale'].size
+    }
@@ -0,0 +1,157 @@
+import numpy as np
+from day_count import DEFAULT_DAY_COUNT, year_fraction_vectorized
+from financial_utils import (
+    get_months_increment_array, to_day_ordinals, generate_coupon_ordinals_matrix,
+    locate_coupons_in_matrix, calculate_accrued_interest_vectorized, solve_safeguarded_newton,
+    broadcast_bond_columns
+)
+
+# Curve times are always measured ACT/365F, whatever the day count of the quoted bonds
+CURVE_DAY_COUNT = "ACT/365F"
+
+class DiscountCurve:
+    """Zero curve with discount factors cached on a daily grid from the valuation date.
+
+    Zero rates are continuously compounded and linearly interpolated between knots (flat
+    outside them). Discount factors for dates inside the grid are plain array lookups.
+    """
+
+    def __init__(self, valuation_date, knot_dates, zero_rates):
+        self.valuation_ordinal = int(to_day_ordinals(valuation_date))
+        self.knot_ordinals = np.atleast_1d(to_day_ordinals(knot_dates))
+        self.knot_times = year_fraction_vectorized(self.valuation_ordinal, self.knot_ordinals, CURVE_DAY_COUNT)
+        self.zero_rates = np.atleast_1d(np.asarray(zero_rates, dtype=float))
+
+        grid_days = np.arange(max(int(self.knot_ordinals.max(initial=0)) - self.valuation_ordinal, 0) + 1)
+        self._grid_discount_factors = self._discount_factors_at_days(grid_days)
+
+    def zero_rate(self, times):
+        """Interpolate continuously compounded zero rates at year fractions from valuation"""
+        return np.interp(times, self.knot_times, self.zero_rates)
+
+    def discount_factors(self, dates):
+        """Get discount factors for dates (dates before valuation get 1)"""
+        return self.discount_factors_from_ordinals(to_day_ordinals(dates))
+
+    def discount_factors_from_ordinals(self, day_ordinals):
+        """Get discount factors for day ordinals, reading the cached grid whenever possible"""
+        days = np.maximum(np.asarray(day_ordinals, dtype=np.int64) - self.valuation_ordinal, 0)
+        grid_size = self._grid_discount_factors.size
+        on_grid = self._grid_discount_factors[np.minimum(days, grid_size - 1)]
+        if days.size == 0 or days.max() < grid_size:
+            return on_grid
+        return np.where(days < grid_size, on_grid, self._discount_factors_at_days(days))
+
+    def price_bonds(self, nominal_values, coupon_rates, coupon_frequencies, issue_dates,
+                    first_coupon_dates, maturity_dates, day_counts=DEFAULT_DAY_COUNT):
+        """Price a portfolio of fixed-coupon bonds off the curve at the valuation date.
+
+        Returns a dict with dirty price, accrued interest and clean price arrays.
+        """
+        cash_flows = expand_bond_cash_flows(
+            self.valuation_ordinal, nominal_values, coupon_rates, coupon_frequencies,
+            issue_dates, first_coupon_dates, maturity_dates, day_counts
+        )
+        dirty_price = (cash_flows['amounts'] * self.discount_factors_from_ordinals(cash_flows['ordinals'])).sum(axis=1)
+
+        return {
+            'dirty_price': dirty_price,
+            'accrued_interest': cash_flows['accrued_interest'],
+            'clean_price': dirty_price - cash_flows['accrued_interest']
+        }
+
+    def _discount_factors_at_days(self, days):
+        """Compute discount factors from interpolated zero rates for day offsets"""
+        times = year_fraction_vectorized(0, days, CURVE_DAY_COUNT)
+        return np.exp(-self.zero_rate(times) * times)
+
+def expand_bond_cash_flows(valuation_ordinal, nominal_values, coupon_rates, coupon_frequencies,
+                           issue_dates, first_coupon_dates, maturity_dates, day_counts=DEFAULT_DAY_COUNT):
+    """Expand bonds into padded matrices of future cash flow dates and amounts.
+
+    Column j < K holds the j-th coupon (amount 0 once paid or past maturity) and the last
+    column the redemption at maturity. Also returns the accrued interest at valuation.
+    """
+    nominal_values, coupon_rates, months_increment, issue, first_coupon, maturity, day_counts = broadcast_bond_columns(
+        np.asarray(nominal_values, dtype=float), np.asarray(coupon_rates, dtype=float),
+        get_months_increment_array(coupon_frequencies), to_day_ordinals(issue_dates),
+        to_day_ordinals(first_coupon_dates), to_day_ordinals(maturity_dates), day_counts
+    )
+    valuation = np.full(nominal_values.shape[0], valuation_ordinal, dtype=np.int64)
+
+    coupon_ordinals, valid = generate_coupon_ordinals_matrix(first_coupon, maturity, months_increment)
+    _, last_coupon, next_coupon, has_last, has_next = locate_coupons_in_matrix(coupon_ordinals, valid, valuation)
+
+    annual_coupon = nominal_values * (coupon_rates / 100)
+    accrued_interest = calculate_accrued_interest_vectorized(
+        annual_coupon, issue, first_coupon, valuation, last_coupon, next_coupon, has_last, has_next, day_counts
+    )
+
+    coupon_per_period = annual_coupon / (12 // months_increment)
+    future = valid & (coupon_ordinals > valuation_ordinal)
+    coupon_amounts = np.where(future, coupon_per_period[:, None], 0.0)
+    redemption = np.where(maturity > valuation_ordinal, nominal_values, 0.0)
+
+    return {
+        'ordinals': np.column_stack([coupon_ordinals, maturity]),
+        'amounts': np.column_stack([coupon_amounts, redemption]),
+        'accrued_interest': accrued_interest
+    }
+
+def bootstrap_discount_curve(valuation_date, clean_prices, coupon_rates, coupon_frequencies,
+                             issue_dates, first_coupon_dates, maturity_dates, nominal_values=100,
+                             day_counts=DEFAULT_DAY_COUNT):
+    """Bootstrap a zero curve from quoted bonds, one knot per bond maturity.
+
+    Bonds are processed by increasing maturity; each knot zero rate is solved so that the
+    bond's dirty price (clean price plus accrued interest) is matched, with cash flows
+    between the previous knot and the new one discounted on the interpolated curve.
+    """
+    valuation_ordinal = int(to_day_ordinals(valuation_date))
+    cash_flows = expand_bond_cash_flows(
+        valuation_ordinal, nominal_values, coupon_rates, coupon_frequencies,
+        issue_dates, first_coupon_dates, maturity_dates, day_counts
+    )
+    clean_prices = np.broadcast_to(np.asarray(clean_prices, dtype=float), cash_flows['accrued_interest'].shape)
+    dirty_prices = clean_prices + cash_flows['accrued_interest']
+    maturities = cash_flows['ordinals'][:, -1]
+
+    if np.any(maturities <= valuation_ordinal):
+        raise ValueError("Tutte le obbligazioni devono scadere dopo la data di valutazione!")
+    if np.unique(maturities).size != maturities.size:
+        raise ValueError("Ogni obbligazione deve avere una scadenza diversa per costruire la curva!")
+
+    order = np.argsort(maturities)
+    knot_times = []
+    zero_rates = []
+
+    for bond in order:
+        times = year_fraction_vectorized(valuation_ordinal, cash_flows['ordinals'][bond], CURVE_DAY_COUNT)
+        amounts = cash_flows['amounts'][bond]
+        knot_time = times[-1]
+
+        # Weight of the new knot in the interpolated zero rate of each cash flow
+        if knot_times:
+            previous_time, previous_rate = knot_times[-1], zero_rates[-1]
+            weights = np.clip((times - previous_time) / (knot_time - previous_time), 0, 1)
+            known_rates = np.interp(times, knot_times, zero_rates)
+        else:
+            previous_rate = 0.0
+            weights = np.ones_like(times)
+            known_rates = np.zeros_like(times)
+
+        def price_difference(knot_rate):
+            rates = np.where(weights > 0, previous_rate + (knot_rate[:, None] - previous_rate) * weights, known_rates)
+            discounted = amounts * np.exp(-rates * times)
+            derivative = -(discounted * times * weights).sum(axis=1)
+            return discounted.sum(axis=1) - dirty_prices[bond], derivative
+
+        knot_rate, converged = solve_safeguarded_newton(price_difference, lower=np.array([-0.5]), upper=1.0,
+                                                        initial_guess=zero_rates[-1] if zero_rates else 0.03)
+        if not converged[0]:
+            raise ValueError("Impossibile costruire la curva: prezzo non coerente con i precedenti.")
+
+        knot_times.append(knot_time)
+        zero_rates.append(float(knot_rate[0]))
+
+    return DiscountCurve(valuation_date, maturities[order].astype("datetime64[D]"), zero_rates)